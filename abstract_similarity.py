@@ -0,0 +1,111 @@
+# abstract_similarity.py
+# Near-duplicate abstracts via sparse TF-IDF cosine similarity, for the
+# conference-paper / journal-extension case where titles were reworded but
+# the abstract was not.
+#
+# Needs scikit-learn (and scipy, which it depends on). Without them the pass
+# is skipped with a warning, like the Parquet backend without pyarrow.
+#
+# The similarity matrix is never materialized. Candidate pairs come from a
+# prefix filter: each vector keeps only its rarest terms, dropping frequent
+# ones while their combined norm stays below the threshold. By Cauchy-Schwarz
+# two abstracts can only reach the threshold if one contains a kept term of
+# the other, so multiplying the pruned vectors against the corpus finds every
+# qualifying pair while touching only short posting lists. A chunk of rows is
+# then scored exactly with one sparse product against the candidate columns,
+# bounded by max_cells, and each row is cut to its matches at or above the
+# threshold before anything is expanded into pairs. A pair is kept if either of
+# its texts ranks the other among its top-k matches: every text contributes at
+# most k partners of its own, while a group of more than k + 1 near-identical
+# copies still ends up linked together.
+
+import numpy as np
+
+
+def _vectorizer():
+    try:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+    except ImportError:
+        print("Warning: scikit-learn is not installed; the abstract similarity pass is skipped.")
+        return None
+    # terms in more than half of the abstracts carry no signal and only densify the products
+    return TfidfVectorizer(sublinear_tf=True, stop_words="english", max_df=0.5, dtype=np.float32)
+
+
+def _prefix_matrix(matrix, threshold):
+    """
+    Copy of the L2-normalized rows of `matrix` without the most frequent terms
+    whose squared weights sum to less than threshold**2 (the prefix filter).
+    """
+    coo = matrix.tocoo()
+    df = np.bincount(coo.col, minlength=matrix.shape[1])
+    order = np.lexsort((-df[coo.col], coo.row))  # per row, most frequent term first
+    row, col, data = coo.row[order], coo.col[order], coo.data[order]
+    cumulative = np.cumsum(data.astype(np.float64) ** 2)
+    row_start = np.r_[0, np.flatnonzero(row[1:] != row[:-1]) + 1]
+    lengths = np.diff(np.r_[row_start, len(row)])
+    cumulative -= np.repeat(np.r_[0.0, cumulative[row_start[1:] - 1]], lengths)
+    kept = cumulative >= threshold ** 2 - 1e-6  # tolerance: float32 weights
+    return type(matrix)((data[kept], (row[kept], col[kept])), shape=matrix.shape)
+
+
+def near_duplicate_pairs(texts, threshold=0.9, top_k=5, query=None, max_cells=5_000_000):
+    """
+    (first, second, similarity) arrays of index pairs into `texts` whose
+    TF-IDF cosine similarity is at least `threshold` and that are among the
+    `top_k` best matches of either text. With `query` (boolean mask) only those
+    texts are compared against the corpus and only their top-k matches count;
+    pairs between two compared texts are returned once (first < second).
+    Returns None if scikit-learn is unavailable.
+    """
+    vectorizer = _vectorizer()
+    if vectorizer is None:
+        return None
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+    n = len(texts)
+    if n < 2:
+        return empty
+    try:
+        matrix = vectorizer.fit_transform(texts).tocsr()  # rows are L2-normalized
+    except ValueError:  # no terms left after stop words / max_df
+        return empty
+    prefix = _prefix_matrix(matrix, threshold).tocsr()
+    transposed = matrix.T.tocsc()
+    rows = np.arange(n) if query is None else np.flatnonzero(query)
+    queried = np.zeros(n, dtype=bool)
+    queried[rows] = True
+    chunk_rows = max(1, max_cells // n)  # the similarities of a chunk hold at most max_cells values
+
+    # top-k matches of every queried row, over all other rows
+    firsts, seconds, sims = [], [], []
+    for start in range(0, len(rows), chunk_rows):
+        chunk = rows[start:start + chunk_rows]
+        columns = np.unique((prefix[chunk] @ transposed).indices)  # rows with a candidate pair in the chunk
+        similarity = (matrix[chunk] @ transposed[:, columns]).tocsr()
+        similarity.data[similarity.data < threshold] = 0
+        similarity.eliminate_zeros()
+        similarity = similarity.tocoo()
+        first, second, sim = chunk[similarity.row], columns[similarity.col], similarity.data
+        other = second != first
+        first, second, sim = first[other], second[other], sim[other]
+        order = np.lexsort((second, -sim, first))  # per row, best first
+        first, second, sim = first[order], second[order], sim[order]
+        starts = np.r_[0, np.flatnonzero(first[1:] != first[:-1]) + 1]
+        rank = np.arange(len(first)) - np.repeat(starts, np.diff(np.r_[starts, len(first)]))
+        top = rank < top_k
+        firsts.append(first[top])
+        seconds.append(second[top])
+        sims.append(sim[top])
+    if not firsts:
+        return empty
+    first, second, sim = np.concatenate(firsts), np.concatenate(seconds), np.concatenate(sims)
+
+    # each pair once: between two queried rows, found from either side, as
+    # (earlier, later); towards an unqueried row as found
+    both = queried[second]
+    reverse = np.isin(first * n + second, second * n + first)
+    keep = ~both | (first < second) | ~reverse
+    first, second, sim, both = first[keep], second[keep], sim[keep], both[keep]
+    swap = both & (first > second)
+    first[swap], second[swap] = second[swap], first[swap]
+    return first, second, sim
@@ -0,0 +1,488 @@
+# benchmarks.py
+# Micro-benchmarks for the hot paths of the pipeline. Each benchmark builds
+# its own synthetic input in a temporary folder, so nothing in results/ is touched.
+#
+#   python benchmarks.py bibtex --entries 10000
+#   python benchmarks.py corpus-memory --records 300000
+#   python benchmarks.py normalize --titles 1000000
+#   python benchmarks.py dedup --records 33000 300000 3000000
+#   python benchmarks.py stage-query --records 300000
+
+import argparse
+import json
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import duplicate_filter
+from dedup_keys import normalize_dois, title_fingerprints
+from duplicate_filter import DuplicateFilter, _normalize_doi, _title_fingerprint
+from export_parser import iter_export_records
+from related_paper_filter import RelatedPaperFilter
+from storage import compact_corpus
+
+BIBTEX_FIELDS = ("year", "title", "abstract", "keywords", "author", "journal", "doi")
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def write_synthetic_bib(path, n_entries, seed=0):
+    rng = random.Random(seed)
+    words = ("robot child learning social interaction speech language tutor "
+             "engagement classroom peer storytelling vocabulary gaze gesture").split()
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n_entries):
+            title = " ".join(rng.choice(words) for _ in range(8)).capitalize()
+            abstract = " ".join(rng.choice(words) for _ in range(180))
+            f.write(
+                f"@inproceedings{{entry{i},\n"
+                f"  author = {{Smith, John and Doe, Jane and Roe, Richard}},\n"
+                f"  booktitle = {{Proceedings of the {{HRI}} Conference}},\n"
+                f"  title = {{{title}}},\n"
+                f"  year = {{{2015 + i % 10}}},\n"
+                f"  doi = {{10.1109/HRI.{i}}},\n"
+                f"  journal = {{Journal {i % 40}}},\n"
+                f"  keywords = {{robot, child, {rng.choice(words)}}},\n"
+                f"  abstract = {{{abstract}}}\n"
+                f"}}\n\n"
+            )
+
+
+def _extract_bibtex_field(field_name, text):
+    """PaperConsolidator's former per-field extractor, kept as the baseline of bench_bibtex."""
+    pattern = rf"{re.escape(field_name)}\s*=\s*\{{(.*?)\}}"
+    match = re.search(pattern, text, re.DOTALL)
+    return match.group(1).replace("\n", " ").strip() if match else ""
+
+
+def _bibtex_regex_scan(path):
+    """The previous approach: whole-file regex split plus one regex search per field."""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().lstrip()
+    entries = re.findall(r'@(\w+)\s*{\s*([^,]+),\s*(.*?)}\s*\n', content, flags=re.DOTALL)
+    for _, _, entry in entries:
+        for field in BIBTEX_FIELDS:
+            _extract_bibtex_field(field, entry)
+    return len(entries)
+
+
+def _bibtex_tokenizer(path):
+    return sum(1 for _ in iter_export_records(path))
+
+
+def bench_bibtex(entries):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.bib")
+        write_synthetic_bib(path, entries)
+        print(f"BibTeX parsing, {entries} entries ({os.path.getsize(path) / 1e6:.1f} MB)")
+        for label, fn in (("regex per field", _bibtex_regex_scan), ("single-pass tokenizer", _bibtex_tokenizer)):
+            n, elapsed = _timed(fn, path)
+            print(f"  {label:<24} {n:>8} records  {elapsed:7.3f} s  {n / elapsed:>10,.0f} records/s")
+
+
+def write_synthetic_corpus(path, n_records, seed=0, vocabulary=0):
+    """
+    A consolidated-corpus-shaped table (same columns as 01_consolidated_papers) as
+    Parquet. The texts draw from 20 topic words only, or with `vocabulary` from that
+    many pseudo-words as well, Zipf-distributed like the words of real abstracts
+    (the topic words ranked among the 200 most frequent).
+    """
+    rng = random.Random(seed)
+    words = ("robot child learning social interaction speech language tutor engagement classroom "
+             "peer storytelling vocabulary gaze gesture parent caregiver autism therapy education").split()
+    if vocabulary:
+        lexicon = _pseudo_words(rng, vocabulary)
+        for w in words:
+            lexicon.insert(rng.randrange(200), w)
+        cdf = np.cumsum(1.0 / (np.arange(len(lexicon)) + 10.0))
+        lexicon = np.array(lexicon, dtype=object)
+        pick = lambda k: lexicon[np.searchsorted(cdf, [rng.random() * cdf[-1] for _ in range(k)])]
+    else:
+        pick = lambda k: [rng.choice(words) for _ in range(k)]
+    sources = ["IEEE", "WoS", "SD", "Scopus", "ACM", "PubMed"]
+    doc_types = ["Conf", "Journal", "Book", "JOUR", "CHAP"]
+    journals = [f"Journal of Topic {i}" for i in range(400)]
+    rows = {c: [] for c in ("Year", "Title", "Abstract", "Keywords", "Author", "Document Identifier", "Journal", "DOI", "Source")}
+    for i in range(n_records):
+        rows["Year"].append(str(2010 + i % 16))
+        rows["Title"].append(" ".join(pick(10)))
+        rows["Abstract"].append(" ".join(pick(150)))
+        rows["Keywords"].append("; ".join(pick(5)))
+        rows["Author"].append(f"Author{i % 5000}, A.; Coauthor{i % 777}, B.")
+        rows["Document Identifier"].append(rng.choice(doc_types))
+        rows["Journal"].append(rng.choice(journals))
+        rows["DOI"].append(f"10.1000/{i}")
+        rows["Source"].append(rng.choice(sources))
+    pd.DataFrame(rows).to_parquet(path, index=False)
+
+
+def _peak_rss_mb():
+    # VmHWM starts over at exec; ru_maxrss can carry the (large) parent's peak on Linux
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+
+def _corpus_memory_child(layout, path):
+    """Runs in a fresh interpreter so each layout gets its own peak RSS."""
+    if layout == "object":
+        # the layout read_excel used to hand every step: plain Python objects, float Year
+        pd.options.future.infer_string = False
+    baseline = _peak_rss_mb()
+    df = pd.read_parquet(path)
+    if layout == "object":
+        df["Year"] = pd.to_numeric(df["Year"], errors="coerce").astype(float)
+        # previous stage step: defensive copies around the combined text and the output frame
+        work = df.copy()
+        work["combined"] = work["Title"].fillna('') + " " + work["Abstract"].fillna('') + " " + work["Keywords"].fillna('')
+        out = work.copy()
+        out["Related"] = "Related"
+        analysis = df.copy()
+    else:
+        df = compact_corpus(df)
+        out = df.assign(combined=RelatedPaperFilter._combine_cols(df), Related="Related")
+        analysis = df.assign(Year=pd.to_numeric(df["Year"], errors="coerce"))
+    peak = _peak_rss_mb()  # `out` and `analysis` are still alive here
+    print(json.dumps({
+        "frame_mb": df.memory_usage(deep=True).sum() / 1e6,
+        "peak_rss_mb": peak,
+        "baseline_rss_mb": baseline,
+    }))
+
+
+def bench_corpus_memory(records):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.parquet")
+        write_synthetic_corpus(path, records)
+        print(f"Corpus memory, {records} records ({os.path.getsize(path) / 1e6:.1f} MB parquet)")
+        for layout, label in (("object", "object columns + copies"), ("compact", "compact layout, no copies")):
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), "_corpus-memory-child", layout, path],
+                                  capture_output=True, text=True, check=True)
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"  {label:<28} frame {r['frame_mb']:8.1f} MB   peak RSS {r['peak_rss_mb']:8.1f} MB "
+                  f"(+{r['peak_rss_mb'] - r['baseline_rss_mb']:.1f} MB over interpreter)")
+
+
+def synthetic_titles_and_dois(n, seed=0):
+    """Titles/DOIs with the mix seen in exports: mostly ASCII, some accents and dashes, ~15% repeats."""
+    rng = random.Random(seed)
+    words = ("robot child learning social interaction speech language tutor engagement classroom "
+             "peer storytelling vocabulary gaze gesture parent caregiver autism therapy education "
+             "naïve école Müller human–robot co-design (HRI): a study of the in").split()
+    titles, dois = [], []
+    for i in range(n):
+        if titles and rng.random() < 0.15:
+            j = rng.randrange(len(titles))
+            titles.append(titles[j])
+            dois.append(dois[j])
+            continue
+        titles.append(" ".join(rng.choice(words) for _ in range(rng.randint(6, 14))).capitalize())
+        dois.append(rng.choice(["", "https://doi.org/", "http://dx.doi.org/"]) + f"10.{1000 + i % 9000}/ABC.{i}"
+                    + rng.choice(["", ".", " ", ")"]))
+    return pd.Series(titles), pd.Series(dois)
+
+
+def bench_normalize(n_titles, workers):
+    titles, dois = synthetic_titles_and_dois(n_titles)
+    print(f"Match-key normalization, {n_titles} titles and DOIs")
+    runs = (
+        ("per-row apply", lambda: (titles.apply(_title_fingerprint), dois.apply(_normalize_doi))),
+        ("batch", lambda: (title_fingerprints(titles), normalize_dois(dois))),
+        (f"batch, workers={workers}", lambda: (title_fingerprints(titles, workers), normalize_dois(dois, workers))),
+    )
+    reference = None
+    for label, fn in runs:
+        (fps, norm), elapsed = _timed(fn)
+        if reference is None:
+            reference = (fps.tolist(), norm.tolist())
+        identical = fps.tolist() == reference[0] and norm.tolist() == reference[1]
+        print(f"  {label:<24} {elapsed:7.3f} s  {n_titles / elapsed:>10,.0f} titles/s  "
+              f"{'identical keys' if identical else 'KEYS DIFFER'}")
+
+
+DUPLICATE_KINDS = ("doi_variant", "title_reorder", "diacritics", "title_typo", "missing_author", "cross_year")
+_ACCENTS = str.maketrans({"e": "é", "a": "à", "o": "ö", "u": "ü", "c": "ç", "n": "ñ"})
+
+
+def _pseudo_words(rng, n, syllables=("ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "bra", "con", "dis", "gen", "ment", "tor", "ly")):
+    words = set()
+    while len(words) < n:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def _typo(rng, title):
+    """Delete one character of one word that is long enough not to vanish."""
+    words = title.split()
+    long = [i for i, w in enumerate(words) if len(w) > 3]
+    if not long:
+        return title + " x"
+    i = rng.choice(long)
+    k = rng.randrange(len(words[i]))
+    words[i] = words[i][:k] + words[i][k + 1:]
+    return " ".join(words)
+
+
+def synthetic_dedup_corpus(n_records, duplicate_rate=0.2, seed=0):
+    """
+    A corpus of `n_records` rows of which `duplicate_rate` are injected
+    duplicates of another row, one DUPLICATE_KINDS perturbation each. Returns
+    (df, truth): truth has per row the id of the original record ("Origin")
+    and the injected kind ("" for originals).
+    """
+    rng = random.Random(seed)
+    vocab = np.array(_pseudo_words(rng, 5000), dtype=object)
+    surnames = np.array([w.capitalize() for w in _pseudo_words(rng, max(2000, n_records // 40))], dtype=object)
+    nprng = np.random.default_rng(seed)
+    def skewed(size, n):
+        # Zipf-Mandelbrot ranks: a few common names/words (the top one ~1-2%), a long tail
+        weights = 1.0 / (np.arange(n) + 10)
+        return nprng.choice(n, size=size, p=weights / weights.sum())
+
+    n_dups = int(n_records * duplicate_rate)
+    n_orig = n_records - n_dups
+    lengths = nprng.integers(6, 15, n_orig)
+    title_words = skewed((n_orig, 14), len(vocab)) + nprng.integers(0, len(vocab), (n_orig, 14))
+    title_words %= len(vocab)
+    abstract_words = nprng.integers(0, len(vocab), (n_orig, 30))
+    first_authors = surnames[skewed(n_orig, len(surnames))]
+    years = nprng.integers(2000, 2025, n_orig)
+    sources = ["IEEE", "WoS", "SD", "Scopus", "ACM", "PubMed"]
+    records = []
+    for i in range(n_orig):
+        records.append({
+            "Year": int(years[i]),
+            "Title": " ".join(vocab[title_words[i, :lengths[i]]]).capitalize(),
+            "Abstract": " ".join(vocab[abstract_words[i]]),
+            "Keywords": "; ".join(vocab[abstract_words[i, :4]]),
+            "Author": f"{first_authors[i]}, A.; {surnames[(i * 7919) % len(surnames)]}, B.",
+            "Document Identifier": "Journal",
+            "Journal": f"Journal {i % 400}",
+            "DOI": f"10.{1000 + i % 9000}/bench.{i}" if rng.random() < 0.7 else "",
+            "Source": rng.choice(sources),
+        })
+    origins, kinds = list(range(n_orig)), [""] * n_orig
+    with_doi = [i for i in range(n_orig) if records[i]["DOI"]]
+    for _ in range(n_dups):
+        kind = rng.choice(DUPLICATE_KINDS)
+        origin = rng.choice(with_doi) if kind == "doi_variant" else rng.randrange(n_orig)
+        dup = dict(records[origin], DOI="", Source=rng.choice(sources))
+        if kind == "doi_variant":
+            # resolver prefix, case, trailing punctuation; the title gains a subtitle
+            dup["DOI"] = rng.choice(["https://doi.org/", "http://dx.doi.org/", ""]) + records[origin]["DOI"].upper() + rng.choice([".", ")", " ", ""])
+            dup["Title"] = records[origin]["Title"] + ": " + " ".join(rng.sample(list(vocab[:50]), 2))
+        elif kind == "title_reorder":
+            words = dup["Title"].lower().split()
+            rng.shuffle(words)
+            dup["Title"] = " ".join(words).capitalize()
+        elif kind == "diacritics":
+            dup["Title"] = dup["Title"].translate(_ACCENTS).replace(" ", rng.choice([" - ", ", ", " "]), 1).upper()
+        elif kind == "title_typo":
+            dup["Title"] = _typo(rng, dup["Title"])
+        elif kind == "missing_author":
+            dup["Title"], dup["Author"] = _typo(rng, dup["Title"]), ""
+        elif kind == "cross_year":
+            dup["Title"], dup["Year"] = _typo(rng, dup["Title"]), dup["Year"] + rng.choice([-1, 1])
+        records.append(dup)
+        origins.append(origin)
+        kinds.append(kind)
+    order = nprng.permutation(n_records)  # interleave duplicates with their originals
+    df = pd.DataFrame([records[i] for i in order])
+    truth = pd.DataFrame({"Origin": np.asarray(origins)[order], "Kind": np.asarray(kinds, dtype=object)[order]})
+    return df, truth
+
+
+def _pair_counts(groups):
+    sizes = pd.Series(groups).value_counts().to_numpy(dtype=np.int64)
+    return int((sizes * (sizes - 1) // 2).sum())
+
+
+def dedup_accuracy(flagged, truth):
+    """
+    Pairwise precision/recall of the duplicate clusters against the injected
+    ones, precision per flag (a flagged row is right when it has the same
+    origin as its cluster's kept row) and recall per injected kind (the
+    duplicate ends up in its original's cluster).
+    """
+    n = len(flagged)
+    cluster = flagged["DuplicateClusterId"].to_numpy(dtype=np.float64, na_value=np.nan)
+    # singletons get their own id
+    cluster = np.where(np.isnan(cluster), -1 - np.arange(n), cluster).astype(np.int64)
+    origin = truth["Origin"].to_numpy()
+    true_pairs = _pair_counts(origin)
+    found_pairs = _pair_counts(cluster)
+    correct_pairs = _pair_counts(cluster * (origin.max() + 1) + origin)
+
+    keep = flagged["Keep"].to_numpy(dtype=bool)
+    kept_origin = pd.Series(origin[keep], index=cluster[keep])
+    rep_origin = kept_origin.reindex(cluster).to_numpy()
+    flags = flagged["DuplicateFlag"].str.replace(r" \(.*", "", regex=True).to_numpy(dtype=object)
+    per_flag = {}
+    for flag in sorted(set(flags[~keep])):
+        rows = ~keep & (flags == flag)
+        per_flag[flag] = {"flagged": int(rows.sum()), "precision": float((rep_origin[rows] == origin[rows]).mean())}
+
+    original_rows = truth["Kind"].to_numpy() == ""
+    origin_cluster = pd.Series(cluster[original_rows], index=origin[original_rows])
+    caught = origin_cluster.reindex(origin).to_numpy() == cluster
+    kinds = truth["Kind"].to_numpy(dtype=object)
+    per_kind = {kind: {"injected": int((kinds == kind).sum()), "recall": float(caught[kinds == kind].mean())}
+                for kind in DUPLICATE_KINDS if (kinds == kind).any()}
+    return {
+        "precision": correct_pairs / found_pairs if found_pairs else 1.0,
+        "recall": correct_pairs / true_pairs if true_pairs else 1.0,
+        "per_flag": per_flag,
+        "per_kind": per_kind,
+    }
+
+
+def _dedup_child(corpus_path, truth_path):
+    """Runs in a fresh interpreter so each corpus size gets its own peak RSS."""
+    df = compact_corpus(pd.read_parquet(corpus_path))
+    truth = pd.read_parquet(truth_path)
+    baseline = _peak_rss_mb()
+    flagged, elapsed = _timed(DuplicateFilter(df)._flag_duplicates, df)
+    peak = _peak_rss_mb()
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak, "baseline_rss_mb": baseline,
+                      **dedup_accuracy(flagged, truth)}))
+
+
+def bench_dedup(sizes, duplicate_rate, lsh, abstracts):
+    print(f"Duplicate detection, {duplicate_rate:.0%} injected duplicates, "
+          f"title LSH {'on' if lsh else 'off'}, abstract similarity {'on' if abstracts else 'off'}")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus_path, truth_path = os.path.join(tmp, "corpus.parquet"), os.path.join(tmp, "truth.parquet")
+            df, truth = synthetic_dedup_corpus(n, duplicate_rate)
+            df.to_parquet(corpus_path, index=False)
+            truth.to_parquet(truth_path, index=False)
+            del df, truth
+            cmd = [sys.executable, os.path.abspath(__file__), "_dedup-child", corpus_path, truth_path]
+            cmd += ["--lsh"] * lsh + ["--abstracts"] * abstracts
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"  {n:>9} records: failed (exit code {proc.returncode})")
+            print("    " + (proc.stderr.strip().splitlines() or ["no output"])[-1])
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"  {n:>9} records  {r['seconds']:8.2f} s  {n / r['seconds']:>9,.0f} records/s  "
+              f"peak RSS {r['peak_rss_mb']:7.0f} MB (+{r['peak_rss_mb'] - r['baseline_rss_mb']:.0f} MB)  "
+              f"pairwise precision {r['precision']:.4f}  recall {r['recall']:.4f}")
+        for flag, m in r["per_flag"].items():
+            print(f"      flag {flag:<32} {m['flagged']:>8} flagged   precision {m['precision']:.4f}")
+        for kind, m in r["per_kind"].items():
+            print(f"      kind {kind:<32} {m['injected']:>8} injected  recall    {m['recall']:.4f}")
+
+
+def _per_keyword_condition(text, processed_query):
+    """The previous approach: one str.contains pass per keyword regex of the processed query."""
+    condition = None
+    for group in processed_query.split(" AND "):  # re.escape escapes spaces, so the separators are unambiguous
+        group_condition = None
+        for kw_regex in group[1:-1].split(" OR "):
+            cond = text.str.contains(kw_regex, case=False, na=False, regex=True)
+            group_condition = cond if group_condition is None else (group_condition | cond)
+        condition = group_condition if condition is None else (condition & group_condition)
+    return condition
+
+
+def bench_stage_query(records, stage, vocabulary):
+    from config import STAGE1, STAGE2, STAGE3
+    query = {1: STAGE1, 2: STAGE2, 3: STAGE3}[stage]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.parquet")
+        write_synthetic_corpus(path, records, vocabulary=vocabulary)
+        df = compact_corpus(pd.read_parquet(path))
+    rpf = RelatedPaperFilter(df)
+    print(f"Stage {stage} query, {records} records, vocabulary {vocabulary or 20} words")
+    rpf._use_index = True
+    text = rpf._combine_cols(df)
+    _, t_build = _timed(rpf._text_index, text)
+    (indexed, _), t_query = _timed(rpf._build_condition, text, query)
+    rpf._index = None
+    print(f"  inverted index   build {t_build:7.3f} s   query {t_query:7.3f} s")
+
+    rpf._use_index = False
+    for label, text in (("Arrow strings", rpf._combine_cols(df)), ("object strings", rpf._combine_cols(df).astype(object))):
+        (grouped, processed), t_grouped = _timed(rpf._build_condition, text, query)
+        per_keyword, t_keyword = _timed(_per_keyword_condition, text, processed)
+        same = grouped.equals(per_keyword) and indexed.equals(grouped)
+        print(f"  {label:<16} per keyword {t_keyword:7.3f} s   one regex per OR group {t_grouped:7.3f} s   "
+              f"x{t_keyword / t_grouped:.1f}  {'identical flags (all three)' if same else 'FLAGS DIFFER'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline micro-benchmarks.")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("bibtex", help="BibTeX entry parsing throughput.")
+    p.add_argument("--entries", type=int, default=10000)
+
+    p = sub.add_parser("corpus-memory", help="Peak RSS of the corpus layout through a stage step.")
+    p.add_argument("--records", type=int, default=300000)
+
+    p = sub.add_parser("normalize", help="Title fingerprint / DOI normalization throughput.")
+    p.add_argument("--titles", type=int, default=1000000)
+    p.add_argument("--workers", type=int, default=-1)
+
+    p = sub.add_parser("dedup", help="Duplicate-filter throughput, peak memory and accuracy on synthetic corpora.")
+    p.add_argument("--records", type=int, nargs="+", default=[33000, 300000, 3000000])
+    p.add_argument("--duplicate-rate", type=float, default=0.2)
+    p.add_argument("--lsh", action="store_true", help="Enable the title LSH pass.")
+    p.add_argument("--abstracts", action="store_true", help="Enable the abstract similarity pass.")
+
+    p = sub.add_parser("stage-query", help="Related-paper query evaluation: per keyword, one regex per OR group, inverted index.")
+    p.add_argument("--records", type=int, default=33000)
+    p.add_argument("--stage", type=int, choices=[1, 2, 3], default=1)
+    p.add_argument("--vocabulary", type=int, default=20000,
+                   help="Zipf-distributed pseudo-words besides the 20 topic words (0: topic words only).")
+
+    p = sub.add_parser("_dedup-child")
+    p.add_argument("corpus_path")
+    p.add_argument("truth_path")
+    p.add_argument("--lsh", action="store_true")
+    p.add_argument("--abstracts", action="store_true")
+
+    p = sub.add_parser("_corpus-memory-child")
+    p.add_argument("layout", choices=["object", "compact"])
+    p.add_argument("path")
+
+    args = parser.parse_args()
+    if args.bench == "bibtex":
+        bench_bibtex(args.entries)
+    elif args.bench == "corpus-memory":
+        bench_corpus_memory(args.records)
+    elif args.bench == "normalize":
+        bench_normalize(args.titles, args.workers)
+    elif args.bench == "dedup":
+        bench_dedup(args.records, args.duplicate_rate, args.lsh, args.abstracts)
+    elif args.bench == "stage-query":
+        bench_stage_query(args.records, args.stage, args.vocabulary)
+    elif args.bench == "_dedup-child":
+        duplicate_filter.TITLE_LSH = args.lsh
+        duplicate_filter.ABSTRACT_SIMILARITY = args.abstracts
+        _dedup_child(args.corpus_path, args.truth_path)
+    elif args.bench == "_corpus-memory-child":
+        _corpus_memory_child(args.layout, args.path)
+
+
+if __name__ == "__main__":
+    main()
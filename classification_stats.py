@@ -4,15 +4,15 @@
 import os
 import pandas as pd
 from typing import Tuple
+from storage import as_frame
 
-def _ensure_cols(df: pd.DataFrame) -> pd.DataFrame:
+def _labels(df: pd.DataFrame) -> pd.Series:
+    """Normalized label per row; only the distinct Classification values are normalized."""
     if "Classification" not in df.columns:
         raise ValueError("Input file must contain a 'Classification' column.")
-    # Optional columns in many of your files:
-    for c in ("Year", "Title", "Abstract", "Related"):
-        if c not in df.columns:
-            df[c] = None
-    return df
+    values = df["Classification"].astype(object)
+    labels = values.map({v: _normalize_label(v) for v in values.dropna().unique()})
+    return labels.fillna("Unclassified").rename("Label")
 
 def _normalize_label(x) -> str:
     if pd.isna(x):
@@ -25,9 +25,7 @@ def summarize_overall(df: pd.DataFrame) -> pd.DataFrame:
     """
     Returns a dataframe: Label | Count | Percent
     """
-    df = _ensure_cols(df.copy())
-    df["Label"] = df["Classification"].apply(_normalize_label)
-    counts = df["Label"].value_counts(dropna=False).rename_axis("Label").reset_index(name="Count")
+    counts = _labels(df).value_counts(dropna=False).rename_axis("Label").reset_index(name="Count")
     total = counts["Count"].sum()
     counts["Percent"] = (counts["Count"] / total * 100).round(2)
     return counts.sort_values(["Count", "Label"], ascending=[False, True]).reset_index(drop=True)
@@ -35,14 +33,14 @@ def summarize_overall(df: pd.DataFrame) -> pd.DataFrame:
 def summarize_by_year(df: pd.DataFrame) -> pd.DataFrame:
     """
     Returns a long table: Year | Label | Count
-    If Year missing, adds Year=None and still returns counts.
+    If Year missing, uses Year=NaN and still returns counts.
     """
-    df = _ensure_cols(df.copy())
-    df["Label"] = df["Classification"].apply(_normalize_label)
+    labels = _labels(df)
     # Coerce Year to numeric where possible
-    df["Year"] = pd.to_numeric(df["Year"], errors="coerce")
+    years = pd.to_numeric(df["Year"], errors="coerce") if "Year" in df.columns else pd.Series(float("nan"), index=df.index)
     by_year = (
-        df.groupby(["Year", "Label"], dropna=False)
+        pd.DataFrame({"Year": years, "Label": labels})
+          .groupby(["Year", "Label"], dropna=False)
           .size()
           .reset_index(name="Count")
           .sort_values(["Year", "Count"], ascending=[True, False])
@@ -51,13 +49,13 @@ def summarize_by_year(df: pd.DataFrame) -> pd.DataFrame:
 
 def write_classification_summaries(input_xlsx: str, output_dir: str) -> Tuple[str, str]:
     """
-    Reads `input_xlsx`, writes two summary files into `output_dir`:
+    Reads `input_xlsx` (a stage table path in any format, see storage.py, or a DataFrame), writes two summary files into `output_dir`:
       - classification_summary_overall.xlsx
       - classification_summary_by_year.xlsx
     Returns (overall_path, by_year_path)
     """
     os.makedirs(output_dir, exist_ok=True)
-    df = pd.read_excel(input_xlsx)
+    df = as_frame(input_xlsx)
 
     overall = summarize_overall(df)
     by_year = summarize_by_year(df)
@@ -30,8 +30,66 @@ STAGE2_QUERY_LOG = "stage2_narrow_query_log.txt"
 STAGE3_QUERY_LOG = "stage3_specific_query_log.txt"
 QUERY_LOG_FILE = STAGE1_QUERY_LOG  # legacy alias
 
+# Machine-readable companions of the query logs: rows surviving each AND step and
+# hit counts / timings of every group and keyword
+STAGE1_QUERY_STATS = "stage1_broad_query_stats.json"
+STAGE2_QUERY_STATS = "stage2_narrow_query_stats.json"
+STAGE3_QUERY_STATS = "stage3_specific_query_stats.json"
+
 CLASSIFIED_PAPERS_FILE = "06_classified_papers.xlsx"
 
+# Storage backend for the intermediate stage tables (01..06):
+#   "parquet" / "feather" (Arrow IPC) need pyarrow; "xlsx" keeps everything in Excel.
+# The file names above keep their .xlsx names; only the extension is swapped.
+STORAGE_FORMAT = "parquet"
+# Also write an .xlsx copy of every stage table for human review (slow on large corpora).
+EXPORT_XLSX = False
+
+# Incremental consolidation: per-file manifest and parsed-record shards (inside RESULT_FOLDER)
+CONSOLIDATION_MANIFEST = "consolidation_manifest.json"
+CONSOLIDATION_CACHE_FOLDER = "consolidation_cache"
+
+# DAG runner (main.py --run_pipeline): per-node input/config/code keys (inside RESULT_FOLDER)
+PIPELINE_STATE_FILE = "pipeline_state.json"
+
+# Duplicate filter: persistent index of match keys and clusters (inside RESULT_FOLDER),
+# used by main.py --incremental_dedup to match only newly added records
+DEDUP_INDEX_FILE = "dedup_index.sqlite"
+
+# Duplicate filter: optional MinHash/LSH pass comparing title fingerprints across
+# all author/year blocks. A pair is flagged when the estimated Jaccard similarity
+# of the fingerprints' character shingles reaches TITLE_LSH_THRESHOLD. Pairs at
+# similarity s become candidates with probability 1 - (1 - s**ROWS)**BANDS.
+TITLE_LSH = False
+TITLE_LSH_THRESHOLD = 0.8
+TITLE_LSH_BANDS = 16
+TITLE_LSH_ROWS = 8
+TITLE_LSH_SHINGLE_SIZE = 3
+
+# Duplicate filter: optional pass flagging records whose abstracts have a TF-IDF
+# cosine similarity of at least ABSTRACT_SIMILARITY_THRESHOLD (reworded titles of
+# the same study). Needs scikit-learn; keeps a pair when it is among the TOP_K best
+# matches of either record (a record may get more partners from other records'
+# picks, so large groups of copies still cluster) and ignores abstracts shorter
+# than MIN_WORDS words.
+ABSTRACT_SIMILARITY = False
+ABSTRACT_SIMILARITY_THRESHOLD = 0.9
+ABSTRACT_SIMILARITY_TOP_K = 5
+ABSTRACT_SIMILARITY_MIN_WORDS = 30
+
+# Stage filter and classifier: evaluate queries on an in-memory inverted index of
+# the texts (inverted_index.py), built once per corpus; every query is then a few
+# posting-list operations instead of regex scans of all texts. Building the index
+# costs about as much as ten regex scans, so it is only built for texts that at
+# least QUERY_INDEX_MIN_QUERIES queries share (the classifier: one query per
+# category); a stage run (one query, three when chained) scans. False: always scan.
+QUERY_INDEX = True
+QUERY_INDEX_MIN_QUERIES = 10
+# Per-keyword hit counts and timings in the stage query stats when scanning: every
+# keyword costs one more regex pass over the rows its group matched. On the
+# inverted index they are always written, at no extra cost.
+QUERY_TERM_STATS = False
+
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = (".bib", ".ris", ".txt", ".nbib")
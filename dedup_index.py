@@ -0,0 +1,87 @@
+# dedup_index.py
+# Persistent duplicate-filter index (SQLite, results/DEDUP_INDEX_FILE).
+#
+# One row per corpus record: a content key identifying the record, its match
+# keys (normalized DOI, title fingerprint, blocking key), its duplicate cluster
+# and its best fuzzy/LSH match. An incremental dedup run takes everything it
+# knows about already-indexed records from here and only normalizes, blocks
+# and scores the new ones.
+
+import json
+import os
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+INDEX_VERSION = 4
+
+# Columns that identify a record; derived columns added later never change its key.
+RECORD_COLUMNS = ("Year", "Title", "Abstract", "Keywords", "Author", "Document Identifier", "Journal", "DOI", "Source")
+
+def record_keys(df):
+    """
+    Content key of every row: a 64-bit hash of the record columns, plus the
+    occurrence number so that identical rows still get distinct keys.
+    """
+    cols = [c for c in RECORD_COLUMNS if c in df.columns]
+    hashes = pd.util.hash_pandas_object(df[cols].astype(str), index=False).to_numpy()
+    occurrence = pd.Series(hashes).groupby(hashes).cumcount().to_numpy()
+    return [f"{h:016x}-{o}" for h, o in zip(hashes.tolist(), occurrence.tolist())]
+
+
+class DedupIndex:
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            " record_key TEXT PRIMARY KEY, doi_norm TEXT, title_fp TEXT, first_author_last TEXT,"
+            " year_num REAL, cluster_id INTEGER, match_score REAL, match_flag TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS records_doi ON records (doi_norm)")
+        conn.execute("CREATE INDEX IF NOT EXISTS records_fp ON records (title_fp)")
+        conn.execute("CREATE INDEX IF NOT EXISTS records_block ON records (first_author_last, year_num)")
+        return conn
+
+    def lookup(self, keys, settings):
+        """
+        Index rows for `keys` (DataFrame aligned with `keys`; all-NaN rows are
+        new records), or (None, reason) when the index cannot be used: missing,
+        built with other settings, or holding records that are no longer in the corpus.
+        """
+        if not os.path.exists(self.path):
+            return None, "no index yet"
+        with closing(self._connect()) as conn:
+            meta = dict(conn.execute("SELECT name, value FROM meta").fetchall())
+            if meta.get("version") != str(INDEX_VERSION) or meta.get("settings") != json.dumps(settings, sort_keys=True):
+                return None, "index built with different settings"
+            stored = pd.read_sql_query("SELECT * FROM records", conn, index_col="record_key")
+        aligned = stored.reindex(keys)
+        missing = len(stored) - int(aligned["title_fp"].notna().sum())
+        if missing:
+            return None, f"{missing} indexed record(s) changed or were removed"
+        return aligned.reset_index(drop=True), None
+
+    def save(self, keys, df, best_match, settings):
+        """Replace the index with the state of `df` after flagging (best_match: {row position: (0-1 score, flag)})."""
+        score = np.full(len(df), np.nan)
+        flag = np.full(len(df), None, dtype=object)
+        for row, (s, f) in best_match.items():
+            score[row], flag[row] = s, f
+        cluster = df["DuplicateClusterId"].astype(object).where(df["DuplicateClusterId"].notna(), None)
+        year = df["Year_num"].astype(object).where(df["Year_num"].notna(), None)
+        rows = zip(keys, df["DOI_norm"].tolist(), df["Title_fp"].tolist(), df["FirstAuthorLast"].tolist(),
+                   year.tolist(), cluster.tolist(), [None if np.isnan(s) else s for s in score.tolist()], flag.tolist())
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM records")
+            conn.executemany("INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("DELETE FROM meta")
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ("version", str(INDEX_VERSION)),
+                ("settings", json.dumps(settings, sort_keys=True)),
+            ])
@@ -0,0 +1,117 @@
+# dedup_keys.py
+# Batch computation of the duplicate-filter match keys (title fingerprints,
+# normalized DOIs). The keys are identical to duplicate_filter._title_fingerprint
+# and duplicate_filter._normalize_doi, which stay as the per-value reference.
+#
+# Speed comes from: normalizing each distinct value once, precompiled patterns,
+# one str.translate pass per title instead of per-character Python code and
+# several regex substitutions, skipping Unicode normalization for ASCII
+# titles and, optionally, joblib workers over chunks of distinct values.
+
+import re
+import unicodedata
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+STOPWORDS = frozenset("""
+a an the of and for in on to with from into by study analysis review
+""".split())
+
+FINGERPRINT_LENGTH = 180
+PREFERRED_SOURCES = ["WoS", "Scopus", "IEEE", "ACM", "SD", "PubMed"]  # tweak to your liking
+PARALLEL_MIN_VALUES = 50000  # fewer distinct values than this are not worth the process start-up
+
+# higher is preferred; sources not listed rank 0
+_SOURCE_RANK = {s: len(PREFERRED_SOURCES) - i for i, s in enumerate(PREFERRED_SOURCES)}
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_DOI_RESOLVER = re.compile(r'^(https?://(dx\.)?doi\.org/)', flags=re.IGNORECASE)
+
+
+class _KeyCharacters(dict):
+    """
+    str.translate table filled on first sight of each character: combining
+    marks are dropped, characters that are neither \\w nor \\s become spaces,
+    everything else maps to itself. Same per-character effect as stripping
+    combining marks and then substituting the punctuation pattern.
+    """
+    def __missing__(self, code):
+        ch = chr(code)
+        if unicodedata.combining(ch):
+            value = None
+        elif _PUNCTUATION.match(ch):
+            value = " "
+        else:
+            value = code
+        self[code] = value
+        return value
+
+
+_KEY_CHARACTERS = _KeyCharacters()
+
+
+def _tokens_key(text):
+    tokens = [w for w in text.split() if w not in STOPWORDS]
+    if "_" in text:
+        tokens = [w.replace("_", "") for w in tokens]
+    return " ".join(sorted(tokens))[:FINGERPRINT_LENGTH]
+
+
+def title_fingerprint(title):
+    """Fingerprint of one title: same result as duplicate_filter._title_fingerprint."""
+    t = title.lower()
+    if not t.isascii():
+        # NFKD(NFKC(x)) == NFKD(x), and both are the identity on ASCII;
+        # dashes are punctuation and end up as spaces like in the reference
+        t = unicodedata.normalize("NFKD", t)
+    return _tokens_key(t.translate(_KEY_CHARACTERS))
+
+
+def normalize_doi(value):
+    """Normalized DOI of one value: same result as duplicate_filter._normalize_doi."""
+    v = unquote(value.strip())
+    v = _DOI_RESOLVER.sub("", v)
+    return v.strip().rstrip(" .;,)").lower()
+
+
+def source_rank(source):
+    """Preference of a record's Source when electing a duplicate representative (higher wins)."""
+    return _SOURCE_RANK.get(source, 0)
+
+
+def source_ranks(sources):
+    """source_rank of a Series of sources, as an int64 array."""
+    return sources.astype(object).map(_SOURCE_RANK).fillna(0).to_numpy(dtype=np.int64)
+
+
+def _apply_chunk(fn, values):
+    return [fn(v) for v in values]
+
+
+def _batch(fn, values, workers):
+    """Apply `fn` to every distinct non-missing value once; missing values map to ""."""
+    series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    uniques = [str(u) for u in uniques.to_numpy(dtype=object)]
+    if workers != 1 and len(uniques) >= PARALLEL_MIN_VALUES:
+        n_chunks = min(64, len(uniques) // 10000)
+        bounds = np.linspace(0, len(uniques), n_chunks + 1, dtype=int)
+        parts = Parallel(n_jobs=workers)(
+            delayed(_apply_chunk)(fn, uniques[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:]))
+        keys = [k for part in parts for k in part]
+    else:
+        keys = _apply_chunk(fn, uniques)
+    lookup = np.array(keys + [""], dtype=object)  # code -1 (missing) -> ""
+    return pd.Series(lookup[codes], index=series.index)
+
+
+def title_fingerprints(titles, workers=1):
+    """Title fingerprints of a Series/list of titles, as a Series aligned with the input."""
+    return _batch(title_fingerprint, titles, workers)
+
+
+def normalize_dois(dois, workers=1):
+    """Normalized DOIs of a Series/list of values, as a Series aligned with the input."""
+    return _batch(normalize_doi, dois, workers)
@@ -97,14 +97,24 @@
 
 import os
 import re
+import numpy as np
 import pandas as pd
 import unicodedata
 from urllib.parse import unquote
 from rapidfuzz import fuzz, process
 from joblib import Parallel, delayed
-from config import BASE_DIR, RESULT_FOLDER, FILTERED_DUPLICATE_FILE, OUTPUT_WITH_FLAGS, TITLES_TO_REMOVE, ABSTRACTS_TO_REMOVE
-
-PREFERRED_SOURCES = ["WoS", "Scopus", "IEEE", "ACM", "SD", "PubMed"]  # tweak to your liking
+from config import BASE_DIR, RESULT_FOLDER, FILTERED_DUPLICATE_FILE, OUTPUT_WITH_FLAGS, TITLES_TO_REMOVE, ABSTRACTS_TO_REMOVE, DEDUP_INDEX_FILE
+from config import TITLE_LSH, TITLE_LSH_THRESHOLD, TITLE_LSH_BANDS, TITLE_LSH_ROWS, TITLE_LSH_SHINGLE_SIZE
+from config import ABSTRACT_SIMILARITY, ABSTRACT_SIMILARITY_THRESHOLD, ABSTRACT_SIMILARITY_TOP_K, ABSTRACT_SIMILARITY_MIN_WORDS
+from minhash_lsh import MinHashLSH
+from abstract_similarity import near_duplicate_pairs
+from dedup_keys import PREFERRED_SOURCES, STOPWORDS, normalize_dois, source_ranks, title_fingerprints
+from dedup_index import DedupIndex, record_keys
+from storage import as_frame, write_table
+
+FUZZY_TITLE_THRESHOLD = 95  # token_set_ratio at or above which two titles in a block are duplicates
+FUZZY_CHUNK_ROWS = 2000     # rows of a block scored per cdist call
+LARGE_BLOCK_WARNING = 500  # blocks at least this big are listed after blocking
 
 def _normalize_doi(value: str) -> str:
     if pd.isna(value):
@@ -123,10 +133,6 @@ def _strip_diacritics(text: str) -> str:
     s = unicodedata.normalize('NFKD', text)
     return "".join(ch for ch in s if not unicodedata.combining(ch))
 
-STOPWORDS = set("""
-a an the of and for in on to with from into by study analysis review
-""".split())
-
 def _title_fingerprint(title: str) -> str:
     if pd.isna(title):
         return ""
@@ -146,105 +152,356 @@ def _first_author_last(author_field: str) -> str:
         return ""
     # your consolidator uses '; ' between names for bibtex and AU  - for RIS; both end up as strings
     first = author_field.split(';')[0].strip()
+    # "Last, First" / "Last, F." (BibTeX, RIS): the surname is before the comma
+    first = first.split(',')[0].strip()
     last = first.split()[-1].lower() if first else ""
     return last
 
+def _first_author_lasts(authors):
+    """Vectorized equivalent of _first_author_last."""
+    # missing authors are "" as in _first_author_last, not "nan" (astype(str) before pandas 3)
+    first_author = authors.astype(str).where(authors.notna(), "").str.split(";", n=1).str[0].str.split(",", n=1).str[0].str.strip()
+    return first_author.str.split().str[-1].str.lower().fillna("")
+
+def _blocking_index(df):
+    """Map (FirstAuthorLast, Year_num) to the row positions of its rows in `df`; rows without a year are not blocked."""
+    return df.groupby(["FirstAuthorLast", "Year_num"], sort=False, dropna=True).indices
+
+def _block_stats(blocks, top=5):
+    sizes = {key: len(rows) for key, rows in blocks.items()}
+    largest = sorted(sizes.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {
+        "blocks": len(sizes),
+        "multi_row_blocks": sum(1 for n in sizes.values() if n > 1),
+        "pairs": sum(n * (n - 1) // 2 for n in sizes.values()),
+        "max_block_size": largest[0][1] if largest else 0,
+        "largest_blocks": largest,
+    }
+
+def _same_key_pairs(keys, mask):
+    """(row, first row with the same key) position pairs for the repeated keys among rows where `mask` is set."""
+    codes, _ = pd.factorize(keys)
+    positions = np.flatnonzero(mask)
+    _, first = np.unique(codes[positions], return_index=True)
+    first_of_code = np.empty(codes.max() + 1 if len(codes) else 0, dtype=np.int64)
+    first_of_code[codes[positions[first]]] = positions[first]
+    partner = first_of_code[codes[positions]]
+    repeated = partner != positions
+    return positions[repeated], partner[repeated]
+
+class UnionFind:
+    """Disjoint sets over row positions 0..n-1 (union by size, path halving)."""
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+    def union_pairs(self, first, second):
+        for a, b in zip(first.tolist(), second.tolist()):
+            self.union(a, b)
+
+    def roots(self):
+        """Root of every element, resolved with vectorized pointer jumping."""
+        roots = np.asarray(self.parent, dtype=np.int64)
+        while True:
+            jumped = roots[roots]
+            if np.array_equal(jumped, roots):
+                return roots
+            roots = jumped
+
 class DuplicateFilter:
-    def __init__(self, input_excel):
+    def __init__(self, input_excel, workers=1, incremental=False):
+        """
+        input_excel: path of the consolidated table, or the DataFrame itself
+        workers:     processes used to compute the match keys (-1 = all cores)
+        incremental: only match records missing from the dedup index (see
+                     DEDUP_INDEX_FILE) and merge them into the stored clusters
+        """
         self.input_excel = input_excel
+        self.workers = workers
+        self.incremental = incremental
         self.base_directory = BASE_DIR
         self.result_folder_path = os.path.join(self.base_directory, RESULT_FOLDER)
+        self.unique_df = None
+        self.block_stats = {}
+        self.best_match = {}
 
     def _create_output_folder(self):
         os.makedirs(self.result_folder_path, exist_ok=True)
 
-    def _flag_duplicates(self, df):
-        """Flag duplicates using DOI, title fingerprint, and blocked fuzzy matching."""
+    def _flag_duplicates(self, df, indexed=None):
+        """
+        Cluster duplicates found by DOI, title fingerprint, blocked fuzzy
+        matching and (optionally) title LSH and abstract similarity, then keep
+        one representative per cluster. Every pass only contributes pairs; the
+        clusters are the connected components of all pairs, so A~B, B~C always
+        ends in one cluster whatever order the pairs were found in.
+
+        indexed: rows of the dedup index aligned with `df` (all-NaN for new
+        records). Indexed records keep their match keys and clusters; only
+        pairs involving a new record are searched for.
+        """
         df["DuplicateFlag"] = ""
         df["Keep"] = True
+        n = len(df)
+        new = np.ones(n, dtype=bool) if indexed is None else indexed["title_fp"].isna().to_numpy()
+        incremental = indexed is not None
 
-        # --- Canonical columns ---
+        # --- Canonical columns (indexed records reuse their stored keys) ---
         df["DOI_raw"] = df["DOI"].astype(str)
-        df["DOI_norm"] = df["DOI_raw"].apply(_normalize_doi)
-
         df["Title_raw"] = df["Title"].astype(str)
-        df["Title_fp"] = df["Title_raw"].apply(_title_fingerprint)
-
-        # Make sure Year is numeric to allow blocking by year ±1
+        # Make sure Year is numeric for blocking
         df["Year_num"] = pd.to_numeric(df["Year"], errors="coerce")
-        df["FirstAuthorLast"] = df["Author"].astype(str).apply(_first_author_last)
-
-        # --- Exact duplicate pass ---
-        # 1) DOI
-        doi_dups = df.duplicated(subset=["DOI_norm"], keep="first") & df["DOI_norm"].ne("")
-        df.loc[doi_dups, ["DuplicateFlag","Keep"]] = ["Duplicate DOI", False]
-
-        # 2) Title fingerprint
-        title_dups = df.duplicated(subset=["Title_fp"], keep="first")
-        df.loc[title_dups & (df["DuplicateFlag"] == ""), ["DuplicateFlag","Keep"]] = ["Duplicate Title (fingerprint)", False]
-
-        # --- Fuzzy pass (blocked) ---
-        # only consider rows not already marked and without DOI matches
-        candidates = df[df["Keep"]].copy()
-
-        def fuzzy_block(group):
-            idx = group.index.tolist()
-            titles = group["Title_raw"].tolist()
-            # token_set_ratio is robust to word order
-            # build lookup to mark near-dups
-            for i in range(len(idx)):
-                if not group.at[idx[i], "Keep"]:
-                    continue
-                for j in range(i+1, len(idx)):
-                    if not group.at[idx[j], "Keep"]:
-                        continue
-                    score = fuzz.token_set_ratio(titles[i], titles[j])
-                    if score >= 95:  # tune if needed
-                        # prefer row with DOI, else longer abstract, else preferred source
-                        a, b = idx[i], idx[j]
-                        def score_row(k):
-                            has_doi = 1 if df.at[k, "DOI_norm"] else 0
-                            abs_len = len(str(df.at[k,"Abstract"])) if pd.notna(df.at[k,"Abstract"]) else 0
-                            src_score = (len(PREFERRED_SOURCES) - PREFERRED_SOURCES.index(df.at[k,"Source"])) if df.at[k,"Source"] in PREFERRED_SOURCES else 0
-                            return (has_doi, abs_len, src_score)
-                        keep, drop = (a,b) if score_row(a) >= score_row(b) else (b,a)
-                        df.at[drop, "DuplicateFlag"] = f"Fuzzy Title ({score})"
-                        df.at[drop, "Keep"] = False
-
-        # block by first-author last name and year window (year, year±1)
-        for yr in candidates["Year_num"].dropna().unique():
-            for delta in (-1, 0, 1):
-                sub = candidates[(candidates["Year_num"] == yr + delta)]
-                if sub.empty: 
-                    continue
-                for last in sub["FirstAuthorLast"].unique():
-                    block = sub[sub["FirstAuthorLast"] == last]
-                    if len(block) > 1:
-                        fuzzy_block(block)
-
+        if incremental:
+            doi_norm = indexed["doi_norm"].to_numpy(dtype=object)
+            title_fp = indexed["title_fp"].to_numpy(dtype=object)
+            first_author_last = indexed["first_author_last"].to_numpy(dtype=object)
+            new_pos = np.flatnonzero(new)
+            doi_norm[new_pos], title_fp[new_pos] = self._match_keys(df, new_pos)
+            first_author_last[new_pos] = _first_author_lasts(df["Author"].iloc[new_pos]).to_numpy()
+            df["DOI_norm"], df["Title_fp"], df["FirstAuthorLast"] = doi_norm, title_fp, first_author_last
+        else:
+            df["DOI_norm"], df["Title_fp"] = self._match_keys(df)
+            df["FirstAuthorLast"] = _first_author_lasts(df["Author"])
+
+        doi_norm = df["DOI_norm"].to_numpy(dtype=object)
+        title_fp = df["Title_fp"].to_numpy(dtype=object)
+
+        # --- Exact duplicate pairs: same DOI, same title fingerprint ---
+        has_doi = doi_norm != ""
+        doi_rows, doi_partners = _same_key_pairs(doi_norm, has_doi)
+        fp_rows, fp_partners = _same_key_pairs(title_fp, np.ones(n, dtype=bool))
+        pairs = [(doi_rows, doi_partners), (fp_rows, fp_partners)]
+
+        # --- Fuzzy pairs (blocked), among the first row of every exact key ---
+        candidates = np.ones(n, dtype=bool)
+        candidates[doi_rows] = False
+        candidates[fp_rows] = False
+        candidate_pos = np.flatnonzero(candidates)
+        titles = df["Title_raw"].to_numpy(dtype=object)
+        similar = {}  # row position -> (score, flag) of its best fuzzy/LSH/abstract match
+
+        def note(a, b, score, flag):
+            # score: similarity on a 0-1 scale, whatever pass found the pair
+            for row in (a, b):
+                if row not in similar or similar[row][0] < score:
+                    similar[row] = (score, flag)
+
+        if incremental:
+            # indexed records: their clusters and best matches as stored
+            stored_cluster = indexed["cluster_id"].astype(float).to_numpy()
+            pairs.append(_same_key_pairs(stored_cluster, ~new & ~np.isnan(stored_cluster)))
+            matched = indexed[indexed["match_flag"].notna()]
+            for row, score, flag in zip(matched.index.tolist(), matched["match_score"].tolist(), matched["match_flag"].tolist()):
+                similar[row] = (score, flag)
+
+        def fuzzy_block(rows):
+            block_titles = titles[rows].tolist()
+            # token_set_ratio is robust to word order; score the upper triangle a
+            # slice of rows at a time so huge blocks stay within memory. Incrementally,
+            # only the rows of new records are scored against the block.
+            scored = np.flatnonzero(new[rows]) if incremental else np.arange(len(rows))
+            for start in range(0, len(scored), FUZZY_CHUNK_ROWS):
+                chunk = scored[start:start + FUZZY_CHUNK_ROWS]
+                lo = 0 if incremental else chunk[0]
+                scores = process.cdist([block_titles[k] for k in chunk], block_titles[lo:], scorer=fuzz.token_set_ratio,
+                                       score_cutoff=FUZZY_TITLE_THRESHOLD, dtype=np.float64, workers=-1)
+                i, j = np.nonzero(scores)
+                a, b = chunk[i], lo + j
+                # each pair once: upper triangle, and new-new pairs only from the earlier row
+                upper = (b > a) | (incremental & ~new[rows[b]])
+                i, j, a, b = i[upper], j[upper], rows[a[upper]], rows[b[upper]]
+                pairs.append((a, b))
+                for x, y, score in zip(a.tolist(), b.tolist(), scores[i, j].tolist()):
+                    note(x, y, score / 100, f"Fuzzy Title ({score})")
+
+        # block by first-author last name and year; every block is scored exactly once
+        blocks = _blocking_index(df.iloc[candidate_pos])
+        self.block_stats = _block_stats(blocks)
+        stats = self.block_stats
+        print(f"Fuzzy blocking: {stats['blocks']} block(s), {stats['pairs']} candidate pair(s), "
+              f"largest block {stats['max_block_size']} row(s).")
+        for (last, year), size in stats["largest_blocks"]:
+            if size >= LARGE_BLOCK_WARNING:
+                print(f"  Large block: author '{last or '<none>'}', year {year:g}: {size} rows")
+        scored_blocks = 0
+        for rows in blocks.values():
+            rows = candidate_pos[rows]
+            if len(rows) > 1 and new[rows].any():
+                fuzzy_block(rows)
+                scored_blocks += 1
+        if incremental:
+            print(f"Incremental dedup: {int(new.sum())} new record(s), {scored_blocks} block(s) re-scored.")
+
+        # --- Near-duplicate titles across blocks (MinHash + LSH, optional) ---
+        if TITLE_LSH:
+            lsh_first, lsh_second, similarity = self._title_lsh_pairs(title_fp, candidate_pos)
+            touched = new[lsh_first] | new[lsh_second]
+            lsh_first, lsh_second, similarity = lsh_first[touched], lsh_second[touched], similarity[touched]
+            pairs.append((lsh_first, lsh_second))
+            for x, y, sim in zip(lsh_first.tolist(), lsh_second.tolist(), similarity.tolist()):
+                note(x, y, sim, f"Near-duplicate Title (LSH {sim:.2f})")
+
+        # --- Near-duplicate abstracts (sparse TF-IDF cosine, optional) ---
+        if ABSTRACT_SIMILARITY:
+            found = self._abstract_pairs(df, candidate_pos, new if incremental else None)
+            if found is not None:
+                pairs.append(found[:2])
+                for x, y, sim in zip(*(a.tolist() for a in found)):
+                    note(x, y, sim, f"Near-duplicate Abstract (cosine {sim:.2f})")
+
+        # --- Clusters ---
+        clusters = UnionFind(n)
+        for first, second in pairs:
+            clusters.union_pairs(first, second)
+        roots = clusters.roots()
+        cluster_size = np.bincount(roots, minlength=n)[roots]
+        in_cluster = cluster_size > 1
+
+        # --- Representative election, one pass over all clusters ---
+        # prefer the row with a DOI, else the longer abstract, else the preferred source; then the earlier row
+        abs_len = df["Abstract"].astype(str).str.len().where(df["Abstract"].notna(), 0).to_numpy(dtype=np.int64)
+        src_score = source_ranks(df["Source"])
+        positions = np.arange(n)
+        order = np.lexsort((positions, -src_score, -abs_len, -has_doi.astype(np.int64), roots))
+        cluster_start = np.ones(n, dtype=bool)
+        cluster_start[1:] = roots[order][1:] != roots[order][:-1]
+        leaders = order[cluster_start]
+        representative = np.empty(n, dtype=np.int64)
+        representative[roots[leaders]] = leaders
+        representative = representative[roots]
+        keep = representative == positions
+
+        # cluster ids 1..k, numbered by each cluster's first row
+        cluster_id = pd.array([pd.NA] * n, dtype="Int64")
+        if in_cluster.any():
+            first_row = np.full(n, n, dtype=np.int64)
+            np.minimum.at(first_row, roots, positions)
+            _, numbered = np.unique(first_row[roots[in_cluster]], return_inverse=True)
+            cluster_id[np.flatnonzero(in_cluster)] = numbered + 1
+
+        # --- Flags: why each dropped row belongs to its cluster ---
+        dropped = np.flatnonzero(~keep)
+        shares_doi = np.zeros(n, dtype=bool)
+        shares_doi[np.concatenate((doi_rows, doi_partners))] = True
+        shares_fp = np.zeros(n, dtype=bool)
+        shares_fp[np.concatenate((fp_rows, fp_partners))] = True
+        flags = np.full(n, "", dtype=object)
+        flags[dropped] = [
+            "Duplicate DOI" if shares_doi[row]
+            else "Duplicate Title (fingerprint)" if shares_fp[row]
+            else similar[row][1]
+            for row in dropped.tolist()
+        ]
+        df["DuplicateFlag"] = flags
+        df["Keep"] = keep
+        df["DuplicateClusterId"] = cluster_id
+        self.best_match = similar
+        print(f"Duplicate clusters: {int(in_cluster.sum())} row(s) in {len(np.unique(roots[in_cluster]))} cluster(s), "
+              f"{len(dropped)} row(s) flagged.")
         return df
 
+    def _match_keys(self, df, positions=None):
+        """
+        Normalized DOIs and title fingerprints (object arrays) of the rows at
+        `positions`, all rows by default. The key columns emitted by
+        PaperConsolidator are reused; otherwise the keys are computed in batch.
+        """
+        rows = df if positions is None else df.iloc[positions]
+        if "DOI_norm" in df.columns and "Title_fp" in df.columns:
+            # empty keys come back as NaN from xlsx
+            return (rows["DOI_norm"].fillna("").astype(str).to_numpy(dtype=object),
+                    rows["Title_fp"].fillna("").astype(str).to_numpy(dtype=object))
+        doi_norm = normalize_dois(rows["DOI_raw"], workers=self.workers)  # batch _normalize_doi
+        title_fp = title_fingerprints(rows["Title_raw"], workers=self.workers)  # batch _title_fingerprint
+        return doi_norm.to_numpy(dtype=object), title_fp.to_numpy(dtype=object)
+
+    def _title_lsh_pairs(self, title_fp, positions):
+        """
+        Compare the title fingerprints of the rows at `positions`, regardless
+        of author and year, through a MinHash/LSH index; catches duplicates
+        whose author field is missing or formatted differently. Returns
+        (first, second, similarity) with row positions.
+        """
+        lsh = MinHashLSH(bands=TITLE_LSH_BANDS, rows=TITLE_LSH_ROWS, shingle_size=TITLE_LSH_SHINGLE_SIZE)
+        first, second, similarity = lsh.near_duplicates(title_fp[positions].tolist(), TITLE_LSH_THRESHOLD)
+        print(f"Title LSH: {len(first)} near-duplicate pair(s) at similarity >= {TITLE_LSH_THRESHOLD}.")
+        return positions[first], positions[second], similarity
+
+    def _abstract_pairs(self, df, positions, new=None):
+        """
+        Compare the abstracts of the rows at `positions` (those with at least
+        ABSTRACT_SIMILARITY_MIN_WORDS words) by TF-IDF cosine similarity; catches
+        reworded titles of the same study. With `new`, only new records are
+        queried against the corpus. Returns (first, second, similarity) with
+        row positions, or None if the pass cannot run.
+        """
+        abstracts = df["Abstract"].iloc[positions]
+        words = abstracts.str.split().str.len().fillna(0).to_numpy()
+        positions = positions[words >= ABSTRACT_SIMILARITY_MIN_WORDS]
+        found = near_duplicate_pairs(df["Abstract"].iloc[positions].tolist(), threshold=ABSTRACT_SIMILARITY_THRESHOLD,
+                                     top_k=ABSTRACT_SIMILARITY_TOP_K, query=None if new is None else new[positions])
+        if found is None:
+            return None
+        first, second, similarity = found
+        print(f"Abstract similarity: {len(first)} near-duplicate pair(s) at cosine >= {ABSTRACT_SIMILARITY_THRESHOLD}.")
+        return positions[first], positions[second], similarity
+
     def _remove_unwanted_rows(self, df):
         df = df[~df["Title"].isin(TITLES_TO_REMOVE)]
         df = df[~df["Abstract"].isin(ABSTRACTS_TO_REMOVE) & df["Abstract"].notna() & (df["Abstract"].str.strip() != "")]
         df = df[~df["Document Identifier"].astype(str).str.lower().eq("book")]
         return df
 
+    @staticmethod
+    def _index_settings():
+        """Settings that shape the clusters; an index built with other values is not reused."""
+        return {
+            "FUZZY_TITLE_THRESHOLD": FUZZY_TITLE_THRESHOLD,
+            "TITLE_LSH": [TITLE_LSH, TITLE_LSH_THRESHOLD, TITLE_LSH_BANDS, TITLE_LSH_ROWS, TITLE_LSH_SHINGLE_SIZE],
+            "ABSTRACT_SIMILARITY": [ABSTRACT_SIMILARITY, ABSTRACT_SIMILARITY_THRESHOLD, ABSTRACT_SIMILARITY_TOP_K,
+                                    ABSTRACT_SIMILARITY_MIN_WORDS],
+        }
+
     def filter_duplicates(self):
         self._create_output_folder()
-        df = pd.read_excel(self.input_excel)
-
-        df_with_flags = self._flag_duplicates(df)
+        df = as_frame(self.input_excel)
+
+        index = DedupIndex(os.path.join(self.result_folder_path, DEDUP_INDEX_FILE))
+        keys = record_keys(df)
+        indexed = None
+        if self.incremental:
+            indexed, reason = index.lookup(keys, self._index_settings())
+            if indexed is None:
+                print(f"Incremental dedup not possible ({reason}); running a full pass.")
+        df_with_flags = self._flag_duplicates(df, indexed)
+        index.save(keys, df_with_flags, self.best_match, self._index_settings())
 
         # Save the audit file with flags
         output_with_flags_path = os.path.join(self.result_folder_path, OUTPUT_WITH_FLAGS)
-        df_with_flags.to_excel(output_with_flags_path, index=False)
+        output_with_flags_path = write_table(df_with_flags, output_with_flags_path)
 
         # Keep the best representative of each duplicate cluster: Keep==True
-        df_unique = df_with_flags[df_with_flags["Keep"]].copy().drop(columns=["Keep", "DuplicateFlag", "DOI_raw","Title_raw","Year_num","FirstAuthorLast"])
+        df_unique = df_with_flags[df_with_flags["Keep"]].drop(columns=["Keep", "DuplicateFlag", "DuplicateClusterId", "DOI_raw","Title_raw","Year_num","FirstAuthorLast"])
         df_unique = self._remove_unwanted_rows(df_unique)
 
         output_filtered_path = os.path.join(self.result_folder_path, FILTERED_DUPLICATE_FILE)
-        df_unique.to_excel(output_filtered_path, index=False)
+        self.unique_df = df_unique
+        output_filtered_path = write_table(df_unique, output_filtered_path)
 
         return output_with_flags_path, output_filtered_path
@@ -0,0 +1,212 @@
+# export_parser.py
+# Streaming readers for the BibTeX / RIS / PubMed (MEDLINE) exports.
+# Files are memory-mapped and walked line by line, so only the record
+# currently being parsed is ever held as Python strings.
+
+import mmap
+import os
+import re
+from contextlib import contextmanager
+
+BIBTEX = "bibtex"
+RIS = "ris"
+PUBMED = "pubmed"
+
+_RIS_START = re.compile(rb"^TY  -", re.MULTILINE)
+
+_BIBTEX_HEAD = re.compile(r'\s*@\s*(\w+)\s*[{(]\s*([^,\s]*)\s*,')
+_BIBTEX_FIELD = re.compile(r'[\s,]*([A-Za-z][\w\-:.]*)\s*=\s*')
+_BIBTEX_BARE = re.compile(r'[^,}\s]*')
+_BIBTEX_DELIMS = re.compile(r'[{}"]')
+_BIBTEX_SKIPPED_TYPES = {"comment", "string", "preamble"}
+
+
+@contextmanager
+def open_export(file_path):
+    """Memory-map an export file read-only. Yields None for empty files."""
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield None
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mm
+        finally:
+            mm.close()
+
+
+def detect_format(mm):
+    """Return BIBTEX, RIS, PUBMED or None, with the same precedence the consolidator always used."""
+    m = re.compile(rb"\S").search(mm)
+    if m is None:
+        return None
+    head = mm[m.start():m.start() + 5]
+    if head.startswith(b"@"):
+        return BIBTEX
+    if _RIS_START.search(mm):
+        return RIS
+    if head == b"PMID-":
+        return PUBMED
+    return None
+
+
+def iter_lines(mm):
+    """Yield decoded lines (without line terminators) from a memory map."""
+    mm.seek(0)
+    for raw in iter(mm.readline, b""):
+        yield raw.decode("utf-8").rstrip("\r\n")
+
+
+def _bibtex_value_end(text, pos):
+    """
+    Return the index of the delimiter closing the braced or quoted value
+    opening at text[pos]. Nested braces are balanced; an unterminated value
+    runs to the end of the entry.
+    """
+    quoted = text[pos] == '"'
+    if not quoted:
+        # fast path: most values contain no nested braces
+        close = text.find("}", pos + 1)
+        if close != -1 and text.find("{", pos + 1, close) == -1:
+            return close
+    depth = 0 if quoted else 1
+    for m in _BIBTEX_DELIMS.finditer(text, pos + 1):
+        ch = m.group()
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0 and not quoted:
+                return m.start()
+        elif quoted and depth == 0 and text[m.start() - 1] != "\\":
+            return m.start()
+    return len(text)
+
+
+def parse_bibtex_entry(text):
+    """
+    Tokenize one BibTeX entry in a single pass.
+
+    Returns (doc_type, identifier, fields) where `fields` maps lower-cased
+    field names to their values (outer braces/quotes removed, newlines
+    collapsed), or None if `text` is not a bibliographic entry.
+    """
+    head = _BIBTEX_HEAD.match(text)
+    if head is None or head.group(1).lower() in _BIBTEX_SKIPPED_TYPES:
+        return None
+    doc_type, identifier = head.groups()
+    fields = {}
+    pos = head.end()
+    n = len(text)
+    while True:
+        m = _BIBTEX_FIELD.match(text, pos)
+        if m is None or m.end() >= n:
+            break
+        name, pos = m.group(1).lower(), m.end()
+        if text[pos] in '{"':
+            end = _bibtex_value_end(text, pos)
+            value, pos = text[pos + 1:end], end + 1
+        else:
+            bare = _BIBTEX_BARE.match(text, pos)
+            value, pos = bare.group(), bare.end()
+        if name not in fields:
+            fields[name] = value.replace("\n", " ").strip()
+    return doc_type, identifier, fields
+
+
+def iter_bibtex_records(mm):
+    """
+    Yield (doc_type, identifier, fields) for every entry. An entry starts at
+    a line beginning with '@' and runs until the next such line.
+    """
+    chunk = []
+    for line in iter_lines(mm):
+        if line.startswith("@") and chunk:
+            parsed = parse_bibtex_entry("\n".join(chunk))
+            if parsed is not None:
+                yield parsed
+            chunk = []
+        if chunk or line.startswith("@"):
+            chunk.append(line)
+    if chunk:
+        parsed = parse_bibtex_entry("\n".join(chunk))
+        if parsed is not None:
+            yield parsed
+
+
+def index_tagged_lines(lines, continuation=False):
+    """
+    Classify the lines of one RIS/MEDLINE record in a single pass and return
+    a {tag: [values]} index. Tag lines carry the '-' separator in column 5
+    ("TI  - ", "AID - ", "PMID- "). With `continuation`, untagged lines are
+    appended to the preceding value (MEDLINE wraps long fields this way);
+    otherwise they are ignored, as RIS has no continuation lines.
+    """
+    parts = {}
+    current = None
+    for line in lines:
+        tag = line[:4].rstrip()
+        if len(line) > 4 and line[4] == "-" and tag.isalnum() and tag.isupper():
+            current = [line[6:].strip()]
+            parts.setdefault(tag, []).append(current)
+        elif continuation and current is not None:
+            text = line.strip()
+            if text:
+                current.append(text)
+    return {tag: [" ".join(p for p in value if p) for value in values] for tag, values in parts.items()}
+
+
+def _iter_ris_lines(mm):
+    has_er = mm.find(b"ER  -") != -1
+    lines = []
+    for line in iter_lines(mm):
+        if has_er and line.startswith("ER  -"):
+            if any(l.strip() for l in lines):
+                yield lines
+            lines = []
+        elif not has_er and not line.strip():
+            if lines:
+                yield lines
+            lines = []
+        elif lines or line.strip():
+            lines.append(line)
+    if any(l.strip() for l in lines):
+        yield lines
+
+
+def iter_ris_records(mm):
+    """
+    Yield the tag index of each RIS record. Records are terminated by
+    'ER  -'; exports without any 'ER  -' tag are split on blank lines.
+    """
+    for lines in _iter_ris_lines(mm):
+        yield index_tagged_lines(lines)
+
+
+def iter_pubmed_records(mm):
+    """Yield the tag index of each MEDLINE record (records are separated by blank lines)."""
+    lines = []
+    for line in iter_lines(mm):
+        if not line.strip():
+            if lines:
+                yield index_tagged_lines(lines, continuation=True)
+            lines = []
+        else:
+            lines.append(line)
+    if lines:
+        yield index_tagged_lines(lines, continuation=True)
+
+
+READERS = {BIBTEX: iter_bibtex_records, RIS: iter_ris_records, PUBMED: iter_pubmed_records}
+
+
+def iter_export_records(file_path):
+    """Yield (format, record) pairs for one export file, one record at a time."""
+    with open_export(file_path) as mm:
+        if mm is None:
+            return
+        fmt = detect_format(mm)
+        if fmt is None:
+            return
+        for record in READERS[fmt](mm):
+            yield fmt, record
@@ -0,0 +1,255 @@
+# inverted_index.py
+# In-memory inverted index over a text column, so that query_compiler ASTs
+# run as posting-list operations instead of regex scans of every text.
+#
+# Texts are lower-cased and split into word tokens (letters, digits, '_').
+# Each token takes one slot of a global token stream, with an empty slot
+# after every text so that nothing spans two texts. The index keeps:
+#   - a sorted term dictionary: exact lookups, prefix ranges found by
+#     bisection for stems like "robot*", and regex scans over the distinct
+#     terms (not the texts) for infix wildcards,
+#   - per term, the texts containing it and its slots (positional postings),
+#   - per slot, its term and the separator text that follows it,
+# so multi-word terms and quoted phrases are matched by stepping from slot to
+# slot with the exact separator the regex would require. Terms that start or
+# end with punctuation (e.g. "C++") fall back to a regex scan of the texts.
+#
+# Tokenizing uses pyarrow's string kernels when available, else re.
+
+import re
+import time
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from query_compiler import BOUNDARY, WILDCARD
+
+_WORD_CHAR = re.compile(r"\w")
+# \w as seen by re, for pyarrow's RE2 kernels
+_WORD_RUN = r"[\p{L}\p{N}_]+"
+_NON_WORD_RUN = r"[^\p{L}\p{N}_]+"
+
+
+# texts tokenized per chunk, keeping the intermediate token lists small
+_CHUNK_SIZE = 20000
+
+
+def _tokenize_arrow(texts):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    texts = pa.array(texts.fillna("").astype(str))
+    if isinstance(texts, pa.ChunkedArray):
+        texts = texts.combine_chunks()
+    texts = pc.utf8_lower(texts.cast(pa.large_string()))
+    token_lists = pc.split_pattern_regex(texts, pattern=_NON_WORD_RUN)
+    # a text with k tokens splits into k + 1 parts around them: [lead, sep_1, ..., sep_k-1, tail]
+    sep_lists = pc.split_pattern_regex(texts, pattern=_WORD_RUN)
+    tokens = pc.list_flatten(token_lists)
+    nonempty = pc.not_equal(tokens, "")  # "" before leading / after trailing punctuation
+    parents = pc.list_parent_indices(token_lists).to_numpy(zero_copy_only=False)
+    counts = np.bincount(parents[nonempty.to_numpy(zero_copy_only=False)], minlength=len(texts))
+    tokens = pc.filter(tokens, nonempty)
+    part_counts = pc.list_value_length(sep_lists).to_numpy(zero_copy_only=False)
+    part_start = np.cumsum(part_counts) - part_counts
+    token_start = np.cumsum(counts) - counts
+    within = np.arange(int(counts.sum())) - np.repeat(token_start, counts)
+    seps = pc.take(pc.list_flatten(sep_lists), pa.array(np.repeat(part_start + 1, counts) + within))
+    tokens, seps = tokens.dictionary_encode(), seps.dictionary_encode()
+    return (counts, tokens.indices.to_numpy(zero_copy_only=False), tokens.dictionary.to_pylist(),
+            seps.indices.to_numpy(zero_copy_only=False), seps.dictionary.to_pylist())
+
+
+def _tokenize_python(texts):
+    counts, tokens, seps = [], [], []
+    for text in texts.fillna("").astype(str):
+        words = list(re.finditer(r"\w+", text.lower()))
+        counts.append(len(words))
+        for i, m in enumerate(words):
+            tokens.append(m.group())
+            seps.append(text[m.end():words[i + 1].start()].lower() if i + 1 < len(words) else "")
+    token_codes, terms = pd.factorize(pd.Series(tokens, dtype=object))
+    sep_codes, separators = pd.factorize(pd.Series(seps, dtype=object))
+    return np.asarray(counts, dtype=np.int64), token_codes, list(terms), sep_codes, list(separators)
+
+
+def _tokenize(texts):
+    """
+    (tokens per text, token codes, separator codes, terms, separators) of a text
+    Series; codes number the terms / separators in order of first appearance.
+    """
+    try:
+        import pyarrow  # noqa: F401
+        tokenize = _tokenize_arrow
+    except ImportError:
+        tokenize = _tokenize_python
+    term_ids, separator_ids = {}, {}
+    counts, codes, sep_codes = [], [], []
+    for start in range(0, len(texts), _CHUNK_SIZE):
+        chunk_counts, chunk_codes, chunk_terms, chunk_sep_codes, chunk_seps = tokenize(texts.iloc[start:start + _CHUNK_SIZE])
+        counts.append(chunk_counts)
+        # chunk-local codes to global ones
+        for local, values, ids, out in ((chunk_codes, chunk_terms, term_ids, codes),
+                                        (chunk_sep_codes, chunk_seps, separator_ids, sep_codes)):
+            mapping = np.array([ids.setdefault(v, len(ids)) for v in values], dtype=np.int32)
+            out.append(mapping[local] if len(local) else np.empty(0, dtype=np.int32))
+    join = lambda parts, dtype: np.concatenate(parts).astype(dtype, copy=False) if parts else np.empty(0, dtype=dtype)
+    return (join(counts, np.int64), join(codes, np.int32), join(sep_codes, np.int32),
+            list(term_ids), list(separator_ids))
+
+
+def _gather(offsets, values, ids):
+    """Concatenated values[offsets[i]:offsets[i + 1]] for every i in `ids`."""
+    starts, lengths = offsets[ids], offsets[ids + 1] - offsets[ids]
+    total = int(lengths.sum())
+    shift = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return values[np.arange(total) + shift]
+
+
+def _token_patterns(atoms):
+    """
+    A term (query_compiler atoms) as token patterns and the separators between
+    them, or None when the index cannot answer it exactly (it starts or ends
+    with a non-word character, or a pattern is nothing but a wildcard). A
+    pattern is (atoms, anchored at the token start, anchored at the token end).
+    """
+    bounded_start, bounded_end = atoms[:1] == [BOUNDARY], atoms[-1:] == [BOUNDARY]
+    body = atoms[bounded_start:len(atoms) - bounded_end]
+    patterns, separators, sep = [[]], [], None
+    for atom in body:
+        if atom == WILDCARD or _WORD_CHAR.match(atom):
+            if sep is not None:
+                separators.append(sep)
+                patterns.append([])
+                sep = None
+            patterns[-1].append(atom)
+        elif atom == BOUNDARY or not patterns[-1]:
+            return None
+        else:
+            sep = atom if sep is None else sep + atom
+    if sep is not None or any(all(a == WILDCARD for a in p) for p in patterns):
+        return None
+    last = len(patterns) - 1
+    return [(p, i > 0 or bounded_start, i < last or bounded_end) for i, p in enumerate(patterns)], separators
+
+
+class InvertedIndex:
+    def __init__(self, texts):
+        """texts: Series of texts (the rows of the index are its positions)."""
+        self.texts = texts
+        self.n_docs = len(texts)
+        counts, codes, sep_codes, terms, separators = _tokenize(texts)
+
+        # sorted term dictionary; codes renumbered to dictionary positions
+        order = np.argsort(np.array(terms, dtype=object), kind="stable")
+        self.terms = [terms[i] for i in order]
+        rank = np.empty(len(terms), dtype=np.int32)
+        rank[order] = np.arange(len(terms), dtype=np.int32)
+        codes = rank[codes]
+        self.term_ids = {t: i for i, t in enumerate(self.terms)}
+        self.separator_ids = {s: i for i, s in enumerate(separators)}
+        n_terms = len(self.terms)
+
+        # token stream: the tokens of each text followed by one empty slot
+        n_tokens = len(codes)
+        slot_dtype = np.int32 if n_tokens + self.n_docs < np.iinfo(np.int32).max else np.int64
+        doc_of_token = np.repeat(np.arange(self.n_docs, dtype=slot_dtype), counts)
+        slots = np.arange(n_tokens, dtype=slot_dtype) + doc_of_token
+        self.doc_start = (np.cumsum(counts) - counts + np.arange(self.n_docs)).astype(slot_dtype)
+        self.slot_term = np.full(n_tokens + self.n_docs, n_terms, dtype=np.int32)  # n_terms: empty slot
+        self.slot_term[slots] = codes
+        sep_dtype = np.int16 if len(separators) < np.iinfo(np.int16).max else np.int32
+        self.slot_separator = np.full(n_tokens + self.n_docs, -1, dtype=sep_dtype)
+        self.slot_separator[slots] = sep_codes
+        del sep_codes
+
+        # postings: slots and texts of every term, in text order
+        by_term = np.argsort(codes, kind="stable")
+        self.slot_offsets = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=n_terms))))
+        self.slot_postings = slots[by_term]
+        del slots
+        docs = doc_of_token[by_term]
+        del doc_of_token
+        codes = codes[by_term]
+        del by_term
+        first = np.ones(len(docs), dtype=bool)
+        first[1:] = (codes[1:] != codes[:-1]) | (docs[1:] != docs[:-1])
+        self.doc_postings = docs[first]
+        self.doc_offsets = np.concatenate(([0], np.cumsum(np.bincount(codes[first], minlength=n_terms))))
+        self.doc_frequency = np.diff(self.doc_offsets)
+
+        self._term_series = None
+        self._pattern_cache = {}
+        self._term_cache = {}
+        # seconds taken to compute each term's matches (term regex -> seconds)
+        self.term_seconds = {}
+
+    # ------------------------- term dictionary -------------------------
+
+    def _pattern_ids(self, pattern, anchored_start, anchored_end):
+        """Ids of the dictionary terms a token pattern matches."""
+        key = (tuple(pattern), anchored_start, anchored_end)
+        if key in self._pattern_cache:
+            return self._pattern_cache[key]
+        stem = pattern
+        while stem and stem[-1] == WILDCARD:
+            stem = stem[:-1]
+        literal = "".join(a.lower() for a in stem)
+        if WILDCARD not in stem and anchored_start and (not anchored_end or stem != pattern):
+            # prefix range of the sorted dictionary
+            lo = bisect_left(self.terms, literal)
+            hi = bisect_left(self.terms, literal + "\U0010ffff", lo)
+            ids = np.arange(lo, hi)
+        elif WILDCARD not in pattern and anchored_start and anchored_end:
+            ids = np.array([self.term_ids[literal]] if literal in self.term_ids else [], dtype=np.int64)
+        else:
+            if self._term_series is None:
+                self._term_series = pd.Series(self.terms, dtype="str")
+            if WILDCARD not in stem and (not anchored_end or stem != pattern):
+                matched = self._term_series.str.contains(literal, regex=False)  # infix stem, e.g. "interact*"
+            else:
+                # tokens hold word characters only, so '*' may match anything inside one
+                regex = "".join(".*" if a == WILDCARD else re.escape(a.lower()) for a in pattern)
+                regex = ("^" if anchored_start else "") + regex + ("$" if anchored_end else "")
+                matched = self._term_series.str.contains(regex, regex=True)
+            ids = np.flatnonzero(matched.to_numpy(dtype=bool))
+        self._pattern_cache[key] = ids
+        return ids
+
+    # ------------------------- evaluation -------------------------
+
+    def term_frequency(self, term):
+        """Upper bound of the number of texts matching a Term (exact once it was evaluated)."""
+        if term.regex in self._term_cache:
+            return int(self._term_cache[term.regex].sum())
+        split = _token_patterns(term.atoms)
+        if split is None:
+            return self.n_docs
+        return min(int(self.doc_frequency[self._pattern_ids(*p)].sum()) for p in split[0])
+
+    def term_mask(self, term):
+        """Boolean array: which texts match a query_compiler Term."""
+        if term.regex in self._term_cache:
+            return self._term_cache[term.regex]
+        started = time.perf_counter()
+        split = _token_patterns(term.atoms)
+        if split is None:
+            mask = term.mask(self.texts).to_numpy(dtype=bool)
+        else:
+            patterns, separators = split
+            ids = [self._pattern_ids(*p) for p in patterns]
+            mask = np.zeros(self.n_docs, dtype=bool)
+            if len(patterns) == 1:
+                mask[_gather(self.doc_offsets, self.doc_postings, ids[0])] = True
+            else:
+                slots = _gather(self.slot_offsets, self.slot_postings, ids[0])
+                for sep, next_ids in zip(separators, ids[1:]):
+                    member = np.zeros(len(self.terms) + 1, dtype=bool)
+                    member[next_ids] = True
+                    follows = (self.slot_separator[slots] == self.separator_ids.get(sep, -2)) & member[self.slot_term[slots + 1]]
+                    slots = slots[follows] + 1
+                mask[np.searchsorted(self.doc_start, slots, side="right") - 1] = True
+        self._term_cache[term.regex] = mask
+        self.term_seconds[term.regex] = time.perf_counter() - started
+        return mask
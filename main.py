@@ -16,9 +16,14 @@ from paper_classifier import PaperClassifier
 from matrices_evaluation import MatricesEvaluation
 from Numerical_Analysis import NumericalAnalysisSummary
 from classification_stats import write_classification_summaries
+from pipeline import DagRunner, build_pipeline
+from storage import resolve_table, table_exists, read_columns, enable_background_writes, wait_for_writes
 
 def _analyze_step(file_path, label, start_year, end_year, result_folder_path):
-    if file_path and os.path.exists(file_path):
+    # file_path may also be the step's DataFrame when running with --in_memory
+    if not isinstance(file_path, pd.DataFrame):
+        wait_for_writes()  # a path may still be being written in the background
+    if isinstance(file_path, pd.DataFrame) or (file_path and table_exists(file_path)):
         analysis = MatricesEvaluation(file_path)
         analysis.analyze(query=label, start_year=int(start_year), end_year=int(end_year))
         print(f"[Analysis] {label} → results saved in: {result_folder_path}")
@@ -27,7 +32,7 @@ def _analyze_step(file_path, label, start_year, end_year, result_folder_path):
 
 def _looks_like_related_file(path: str) -> bool:
     try:
-        cols = pd.read_excel(path, nrows=0).columns
+        cols = read_columns(path)
         # Many of your staged files have a 'Related' flag; keep it lenient:
         return "Title" in cols or "Related" in cols
     except Exception:
@@ -39,10 +44,13 @@ def main():
     parser.add_argument("--folder_names", type=str, default=FOLDER_NAMES, help="Comma-separated source folders, e.g., 'IEEE,WoS,SD'.")
     parser.add_argument("--start_year", type=str, default=START_YEAR, help="Start year.")
     parser.add_argument("--end_year", type=str, default=END_YEAR, help="End year.")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to parse export files during consolidation and to compute duplicate match keys (-1 = all cores).")
 
     # legacy steps
     parser.add_argument("--run_consolidate", action="store_true", help="Run consolidation step.")
+    parser.add_argument("--full_consolidate", action="store_true", help="Ignore the consolidation cache and re-parse every export file.")
     parser.add_argument("--run_duplicates", action="store_true", help="Run duplicate filtering step.")
+    parser.add_argument("--incremental_dedup", action="store_true", help="Only match records not yet in the dedup index and merge them into the existing duplicate clusters.")
     # new staged options
     parser.add_argument("--run_stage1", action="store_true", help="Run Stage 1 (Broad) on current input.")
     parser.add_argument("--run_stage2", action="store_true", help="Run Stage 2 (Narrow) on current input.")
@@ -58,27 +66,48 @@ def main():
     parser.add_argument("--run_analysis", action="store_true", help="Run analysis step.")
     parser.add_argument("--run_numerical", action="store_true", help="Run numerical analysis step.")
     parser.add_argument("--summarize_classes", action="store_true", help="After classification, write label summaries (overall and by year).")
+    parser.add_argument("--run_pipeline", action="store_true", help="Run consolidate -> dedup -> stages 1-3 -> classify -> analysis, re-executing only steps whose inputs, config or code changed.")
+    parser.add_argument("--force_pipeline", action="store_true", help="With --run_pipeline: re-execute every step.")
+    parser.add_argument("--in_memory", action="store_true", help="Hand DataFrames directly between steps; stage files are still written, on a background thread.")
 
 
     args = parser.parse_args()
 
+    if args.run_pipeline:
+        nodes = build_pipeline(folder_names=args.folder_names, classify_mode=args.classify_using,
+                               start_year=args.start_year, end_year=args.end_year, workers=args.workers)
+        outputs = DagRunner(nodes, force=args.force_pipeline).run()
+        print("Pipeline complete. Classified output at:", outputs["classify"][0])
+        return
+
     result_folder_path = os.path.join(os.getcwd(), RESULT_FOLDER)
     os.makedirs(result_folder_path, exist_ok=True)
     last_output = None
+    # In-memory mode: the DataFrame behind last_output, handed to the next step instead of the path
+    last_df = None
+    if args.in_memory:
+        enable_background_writes()
+
+    def current_input():
+        return last_df if last_df is not None else last_output
 
     # Step 1: Consolidation
     consolidated_output = os.path.join(result_folder_path, CONSOLIDATED_FILE)
     
     if args.run_consolidate:
-        consolidator = PaperConsolidator(folder_names=args.folder_names)
+        consolidator = PaperConsolidator(folder_names=args.folder_names, workers=args.workers,
+                                         incremental=not args.full_consolidate)
         consolidated_output = consolidator.consolidate()
         print("Consolidation complete. Output at:", consolidated_output)
         last_output = consolidated_output
+        if args.in_memory:
+            last_df = consolidator.consolidated_df
 
         if args.run_analysis:
-            _analyze_step(last_output, "After Consolidation", args.start_year, args.end_year, result_folder_path)
+            _analyze_step(current_input(), "After Consolidation", args.start_year, args.end_year, result_folder_path)
 
-    elif os.path.exists(consolidated_output):
+    elif table_exists(consolidated_output):
+        consolidated_output = resolve_table(consolidated_output)
         print("Using existing consolidated file at:", consolidated_output)
         last_output = consolidated_output
     else:
@@ -88,66 +117,79 @@ def main():
     # Step 2: Duplicate Filtering
     filtered_file = os.path.join(result_folder_path, FILTERED_DUPLICATE_FILE)
     if args.run_duplicates:
-        dup_filter = DuplicateFilter(input_excel=last_output)
+        dup_filter = DuplicateFilter(input_excel=current_input(), workers=args.workers,
+                                     incremental=args.incremental_dedup)
         _, filtered_file = dup_filter.filter_duplicates()
         print("Duplicate filtering complete. Output at:", filtered_file)
         last_output = filtered_file
+        if args.in_memory:
+            last_df = dup_filter.unique_df
         if args.run_analysis:
-            _analyze_step(last_output, "After Duplicate Filtering", args.start_year, args.end_year, result_folder_path)
+            _analyze_step(current_input(), "After Duplicate Filtering", args.start_year, args.end_year, result_folder_path)
 
-    elif os.path.exists(filtered_file):
+    elif table_exists(filtered_file):
+        filtered_file = resolve_table(filtered_file)
         print("Using existing duplicate filtered file at:", filtered_file)
         last_output = filtered_file
+        last_df = None
     else:
         print("Warning: No duplicate filtered file found. Proceeding without duplicate filtering.")
 
     # Step 3: Related Filtering — staged options
-    rpf = RelatedPaperFilter(input_file=last_output, debug=True)
+    rpf = RelatedPaperFilter(input_file=current_input(), debug=True)
 
     if args.run_staged_from_dedup:
+        wait_for_writes()  # reads the dedup file from disk
         outputs = rpf.run_from_dedup()  # starts from the standard dedup file in results/
-        last_output = os.path.join(result_folder_path, STAGE3_FILTERED_FILE)
+        last_output = outputs[3][1]
+        last_df = rpf.related_frames[3] if args.in_memory else None
         print("Staged-from-dedup filtering complete. Final output at:", last_output)
 
     # Full chained stages 1->2->3
     elif args.run_staged:
         outputs = rpf.run_chained((1, 2, 3))
-        last_output = os.path.join(result_folder_path, STAGE3_FILTERED_FILE)
+        last_output = outputs[3][1]
+        last_df = rpf.related_frames[3] if args.in_memory else None
         print("Staged filtering complete. Final output at:", last_output)
         if args.run_analysis:
-            _analyze_step(last_output, "Full chained stages 1->2->3", args.start_year, args.end_year, result_folder_path)
+            _analyze_step(current_input(), "Full chained stages 1->2->3", args.start_year, args.end_year, result_folder_path)
     else:
         # Single stages (new flags)
         if args.run_stage1:
             _, stage1_filtered = rpf.run_single_stage(1)
             last_output = stage1_filtered
+            last_df = rpf.related_frames[1] if args.in_memory else None
             print("Stage 1 complete. Output at:", stage1_filtered)
             if args.run_analysis:
-                _analyze_step(last_output, "run_stage1", args.start_year, args.end_year, result_folder_path)
+                _analyze_step(current_input(), "run_stage1", args.start_year, args.end_year, result_folder_path)
         if args.run_stage2:
             # if stage2 requested without stage1, we use current last_output
-            rpf = RelatedPaperFilter(input_file=last_output, debug=True)
+            rpf = RelatedPaperFilter(input_file=current_input(), debug=True)
             _, stage2_filtered = rpf.run_single_stage(2)
             last_output = stage2_filtered
+            last_df = rpf.related_frames[2] if args.in_memory else None
             print("Stage 2 complete. Output at:", stage2_filtered)
             if args.run_analysis:
-                _analyze_step(last_output, "run_stage2", args.start_year, args.end_year, result_folder_path)
+                _analyze_step(current_input(), "run_stage2", args.start_year, args.end_year, result_folder_path)
 
         if args.run_stage3:
-            rpf = RelatedPaperFilter(input_file=last_output, debug=True)
+            rpf = RelatedPaperFilter(input_file=current_input(), debug=True)
             _, stage3_filtered = rpf.run_single_stage(3)
             last_output = stage3_filtered
+            last_df = rpf.related_frames[3] if args.in_memory else None
             print("Stage 3 complete. Output at:", stage3_filtered)
             if args.run_analysis:
-                _analyze_step(last_output, "run_stage3", args.start_year, args.end_year, result_folder_path)
+                _analyze_step(current_input(), "run_stage3", args.start_year, args.end_year, result_folder_path)
 
         
         # If none of the above flags, but prior stage files exist, choose latest available
         if last_output is None:
             for candidate in (STAGE3_FILTERED_FILE, STAGE2_FILTERED_FILE, STAGE1_FILTERED_FILE):
                 p = os.path.join(result_folder_path, candidate)
-                if os.path.exists(p):
+                if table_exists(p):
+                    p = resolve_table(p)
                     last_output = p
+                    last_df = None
                     print("Using existing related file at:", p)
                     break
             if last_output is None:
@@ -177,7 +219,8 @@ def main():
         classify_input = None
         # 1) If user explicitly provided a file, use it (with a quick sanity check)
         if args.classify_from:
-            if os.path.exists(args.classify_from) and _looks_like_related_file(args.classify_from):
+            wait_for_writes()  # --classify_from may name a stage file still being written
+            if table_exists(args.classify_from) and _looks_like_related_file(args.classify_from):
                 classify_input = args.classify_from
             else:
                 print(f"Error: --classify_from not usable: {args.classify_from}")
@@ -185,23 +228,24 @@ def main():
 
         # 2) Otherwise, fall back to whatever the pipeline last produced
         if classify_input is None:
-            classify_input = last_output
+            classify_input = current_input()
 
-        if not classify_input or not os.path.exists(classify_input):
+        if classify_input is None or (not isinstance(classify_input, pd.DataFrame) and not table_exists(classify_input)):
             print("Error: No suitable input found for classification.")
         else:
             # classifier = PaperClassifier(input_file=classify_input)
             classifier = PaperClassifier(input_file=classify_input, mode=args.classify_using)
             classified_output = classifier.classify()
             print("Classification complete.")
-            print("  Input :", classify_input)
+            print("  Input :", last_output if classify_input is last_df else classify_input)
             print("  Output:", classified_output)
             last_output = classified_output
+            last_df = classifier.classified_df if args.in_memory else None
             # Auto-summary (guarded by flag, or make it always-on if you prefer)
             try:
                 if getattr(args, "summarize_classes", False):
                     overall_path, by_year_path = write_classification_summaries(
-                        classified_output, result_folder_path
+                        current_input(), result_folder_path
                     )
                     print("Classification summaries written:")
                     print("  Overall:", overall_path)
@@ -210,12 +254,14 @@ def main():
                 print("Warning: could not write classification summaries:", e)
 
             if args.run_analysis:
-                _analyze_step(last_output, "After Classification",
+                _analyze_step(current_input(), "After Classification",
                             args.start_year, args.end_year, result_folder_path)
 
-    elif os.path.exists(classified_output):
+    elif table_exists(classified_output):
+        classified_output = resolve_table(classified_output)
         print("Using existing classified papers file at:", classified_output)
         last_output = classified_output
+        last_df = None
         if args.run_analysis:
             _analyze_step(last_output, "After Classification",
                         args.start_year, args.end_year, result_folder_path)
@@ -225,8 +271,8 @@ def main():
 
     # Step 5: Analysis
     if args.run_analysis:
-        if last_output and os.path.exists(last_output):
-            analysis = MatricesEvaluation(last_output)
+        if last_df is not None or (last_output and table_exists(last_output)):
+            analysis = MatricesEvaluation(current_input())
             # Keep the previous behavior but simplify "query" label:
             analysis_query = "Staged Filtering / Latest Output"
             analysis.analyze(query=analysis_query, start_year=int(args.start_year), end_year=int(args.end_year))
@@ -244,5 +290,9 @@ def main():
     else:
         print("Numerical analysis step skipped.")
 
+    # Flush stage files still being written in the background (--in_memory)
+    wait_for_writes()
+    enable_background_writes(False)
+
 if __name__ == "__main__":
     main()
@@ -4,12 +4,13 @@ import matplotlib.pyplot as plt
 import os
 import re
 from config import BASE_DIR, RESULT_FOLDER, NUMERICAL_ANALYSIS_SUMMARY, PAPERS_PER_YEAR_PLOT, DOCUMENT_IDENTIFIER_DISTRIBUTION_PLOT, SOURCE_DISTRIBUTION_PLOT, START_YEAR, END_YEAR
+from storage import as_frame
 
 
 class MatricesEvaluation:
     def __init__(self, related_file):
         self.related_file = related_file
-        self.df = pd.read_excel(self.related_file)
+        self.df = as_frame(self.related_file)
         self.result_folder_path = os.path.join(BASE_DIR, RESULT_FOLDER)
         os.makedirs(self.result_folder_path, exist_ok=True)
 
@@ -46,6 +47,7 @@ class MatricesEvaluation:
         """
         if 'Document Identifier' in df.columns:
             doc_identifier_counts = df['Document Identifier'].value_counts()
+            doc_identifier_counts = doc_identifier_counts[doc_identifier_counts > 0]  # unused categories
             colors = plt.cm.Paired.colors[:len(doc_identifier_counts)]  # Generate distinct colors
             plt.figure(figsize=(8, 5))
             plt.pie(doc_identifier_counts, labels=doc_identifier_counts.index, autopct='%1.1f%%', 
@@ -60,7 +62,8 @@ class MatricesEvaluation:
         Plots the distribution of sources and saves the figure.
         """
         if 'Source' in df.columns:
-            source_counts = df['Source'].value_counts().head(10)  # Show top 10 sources
+            source_counts = df['Source'].value_counts()
+            source_counts = source_counts[source_counts > 0].head(10)  # Show top 10 sources
             colors = plt.cm.Set3.colors[:len(source_counts)]  # Generate distinct colors
             plt.figure(figsize=(10, 5))
             plt.bar(source_counts.index, source_counts.values, color=colors)
@@ -92,10 +95,8 @@ class MatricesEvaluation:
         2. Distribution of Document Identifiers (Conf, Journal, Book, etc.).
         3. Analysis of the Source column.
         """
-        df = self.df.copy()
-
-        # Ensure 'Year' column is numeric
-        df['Year'] = pd.to_numeric(df['Year'], errors='coerce')
+        # Ensure 'Year' column is numeric (assign() does not copy the corpus)
+        df = self.df.assign(Year=pd.to_numeric(self.df['Year'], errors='coerce'))
 
         # Filter by user-specified year range or config defaults
         df = self._filter_by_year(df, start_year, end_year)
@@ -0,0 +1,102 @@
+# minhash_lsh.py
+# MinHash signatures + LSH banding for corpus-wide near-duplicate candidates.
+#
+# Each text is turned into its set of character shingles; a MinHash signature
+# of BANDS * ROWS values estimates the Jaccard similarity of two such sets.
+# Texts whose signatures agree on all ROWS values of at least one band land in
+# the same bucket and become a candidate pair, so only colliding texts are ever
+# compared instead of all n^2 pairs.
+
+import zlib
+import numpy as np
+
+_PRIME = (1 << 31) - 1  # keeps a * x + b below 2**63 for 31-bit a, b and x
+_SIGNATURE_CHUNK = 2000  # texts shingled per step; hashing holds one int64 per shingle at a time
+
+
+class MinHashLSH:
+    def __init__(self, bands=16, rows=8, shingle_size=3, seed=1):
+        """
+        bands, rows:  LSH banding; the signature has bands * rows values and a
+                      pair with Jaccard similarity s collides with probability
+                      1 - (1 - s**rows)**bands
+        shingle_size: characters per shingle
+        """
+        self.bands = bands
+        self.rows = rows
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=(bands * rows, 1), dtype=np.int64)
+        self._b = rng.integers(0, _PRIME, size=(bands * rows, 1), dtype=np.int64)
+
+    def _shingle_hashes(self, text):
+        k = self.shingle_size
+        if not text:
+            return ()
+        if len(text) <= k:
+            return {zlib.crc32(text.encode("utf-8")) % _PRIME}
+        return {zlib.crc32(text[i:i + k].encode("utf-8")) % _PRIME for i in range(len(text) - k + 1)}
+
+    def signatures(self, texts):
+        """
+        Return (signatures, valid): an (n, bands * rows) int64 array and a
+        boolean mask of the texts that had any shingle (empty texts never match).
+        """
+        n = len(texts)
+        signatures = np.full((n, self.bands * self.rows), _PRIME, dtype=np.int64)
+        valid = np.zeros(n, dtype=bool)
+        for start in range(0, n, _SIGNATURE_CHUNK):
+            shingles = [self._shingle_hashes(t) for t in texts[start:start + _SIGNATURE_CHUNK]]
+            sizes = np.fromiter((len(s) for s in shingles), dtype=np.int64, count=len(shingles))
+            rows = np.flatnonzero(sizes)
+            if rows.size == 0:
+                continue
+            flat = np.fromiter((h for s in shingles for h in s), dtype=np.int64, count=int(sizes.sum()))
+            offsets = np.concatenate(([0], np.cumsum(sizes[rows])[:-1]))
+            hashed = np.empty_like(flat)
+            block = np.empty((rows.size, self.bands * self.rows), dtype=np.int64)
+            # one hash function at a time: a bands * rows x shingles array would
+            # cost hundreds of MB per chunk of long titles
+            for h in range(self.bands * self.rows):
+                np.multiply(flat, self._a[h, 0], out=hashed)
+                hashed += self._b[h, 0]
+                np.remainder(hashed, _PRIME, out=hashed)
+                block[:, h] = np.minimum.reduceat(hashed, offsets)
+            signatures[start + rows] = block
+            valid[start + rows] = True
+        return signatures, valid
+
+    def candidate_pairs(self, signatures, valid):
+        """Unique (i, j) index pairs, i < j, that share at least one band bucket."""
+        n = len(signatures)
+        ids = np.flatnonzero(valid)
+        pairs = []
+        for band in range(self.bands):
+            block = np.ascontiguousarray(signatures[ids, band * self.rows:(band + 1) * self.rows])
+            keys = block.view(np.dtype((np.void, block.dtype.itemsize * self.rows))).ravel()
+            _, bucket, counts = np.unique(keys, return_inverse=True, return_counts=True)
+            shared = counts[bucket] > 1
+            if not shared.any():
+                continue
+            members, bucket = ids[shared], bucket[shared]
+            order = np.argsort(bucket, kind="stable")
+            members, bucket = members[order], bucket[order]
+            starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+            for group in np.split(members, starts[1:]):
+                i, j = np.triu_indices(len(group), k=1)
+                pairs.append(group[i] * n + group[j])
+        if not pairs:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        packed = np.unique(np.concatenate(pairs))
+        return packed // n, packed % n
+
+    def near_duplicates(self, texts, threshold):
+        """
+        (i, j, similarity) arrays for the candidate pairs whose estimated
+        Jaccard similarity is at least `threshold`, ordered by (i, j).
+        """
+        signatures, valid = self.signatures(texts)
+        i, j = self.candidate_pairs(signatures, valid)
+        similarity = (signatures[i] == signatures[j]).mean(axis=1)
+        keep = similarity >= threshold
+        return i[keep], j[keep], similarity[keep]
@@ -152,16 +152,21 @@
 # Single-label classifier with selectable text fields: title | abstract | both
 
 import os
-import re
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 
 from config import (
     BASE_DIR,
     RESULT_FOLDER,
     CLASSIFIED_PAPERS_FILE,
     Sorting_Stage,
+    QUERY_INDEX,
+    QUERY_INDEX_MIN_QUERIES,
 )
+from inverted_index import InvertedIndex
+from query_compiler import compile_query
+from storage import as_frame, write_table
 
 class PaperClassifier:
     def __init__(self, input_file: str, mode: str = "both"):
@@ -171,8 +176,9 @@ class PaperClassifier:
           - "abstract" -> use Abstract only
           - "both"     -> prefer Title matches; else Title+Abstract (default)
         """
-        self.input_file = input_file
+        self.input_file = input_file  # table path or DataFrame
         self.output_file = CLASSIFIED_PAPERS_FILE
+        self.classified_df = None
         self.result_folder = RESULT_FOLDER
         self.base_directory = BASE_DIR
         self.result_folder_path = os.path.join(self.base_directory, self.result_folder)
@@ -225,50 +231,17 @@ class PaperClassifier:
 
     # ------------------------- boolean matching -------------------------
 
-    def _match_term(self, term: str, text: str) -> bool:
-        term = term.strip()
-        if ((term.startswith('"') and term.endswith('"')) or
-            (term.startswith("'") and term.endswith("'"))):
-            phrase = term[1:-1].strip()
-            pattern = r'\b' + re.escape(phrase) + r'\b'
-            return bool(re.search(pattern, text, flags=re.IGNORECASE))
-        if term.endswith("*"):
-            stem = re.escape(term[:-1])
-            pattern = r'\b' + stem + r'\w*'
-            return bool(re.search(pattern, text, flags=re.IGNORECASE))
-        return term.lower() in text
-
-    def _evaluate_query(self, query: str, text: str) -> bool:
-        text = text.lower()
-        query = query.strip().replace("NotAND", "ANDNOT")
-        if query.startswith("(") and query.endswith(")"):
-            query = query[1:-1].strip()
-        groups = re.split(r'\s+AND\s+(?!NOT)', query, flags=re.IGNORECASE)
-
-        for group in groups:
-            group = group.strip()
-            if "ANDNOT" in group:
-                pos_neg = re.split(r'\s+ANDNOT\s+', group, flags=re.IGNORECASE)
-                pos_part = pos_neg[0].strip() if pos_neg else ""
-                neg_part = pos_neg[1].strip() if len(pos_neg) > 1 else ""
-                if pos_part.startswith("(") and pos_part.endswith(")"):
-                    pos_part = pos_part[1:-1].strip()
-                if neg_part.startswith("(") and neg_part.endswith(")"):
-                    neg_part = neg_part[1:-1].strip()
-                pos_terms = re.split(r'\s+OR\s+', pos_part, flags=re.IGNORECASE)
-                neg_terms = re.split(r'\s+OR\s+', neg_part, flags=re.IGNORECASE)
-                pos_match = any(self._match_term(t, text) for t in pos_terms if t.strip())
-                neg_match = any(self._match_term(t, text) for t in neg_terms if t.strip())
-                if not pos_match or neg_match:
-                    return False
-            else:
-                grp = group
-                if grp.startswith("(") and grp.endswith(")"):
-                    grp = grp[1:-1].strip()
-                terms = re.split(r'\s+OR\s+', grp, flags=re.IGNORECASE)
-                if not any(self._match_term(t, text) for t in terms if t.strip()):
-                    return False
-        return True
+    def _query_mask(self, node, texts: pd.Series, indexes: Optional[Dict[int, InvertedIndex]]) -> np.ndarray:
+        """
+        Boolean array of the texts matching a compiled query: on an inverted
+        index of `texts` (built on first use, kept in `indexes`), or by regex
+        scans when `indexes` is None.
+        """
+        if indexes is None:
+            return node.mask(texts).to_numpy(dtype=bool)
+        if id(texts) not in indexes:
+            indexes[id(texts)] = InvertedIndex(texts)
+        return node.evaluate(indexes[id(texts)])
 
     # ------------------------- ranking utilities -------------------------
 
@@ -293,60 +266,53 @@ class PaperClassifier:
         self._create_output_folder()
         self._collapse_duplicate_categories()
 
-        df = pd.read_excel(self.input_file)
-        if "Title" not in df.columns:
-            df["Title"] = ""
-        if "Abstract" not in df.columns:
-            df["Abstract"] = ""
-
-        df["TitleText"] = df["Title"].fillna("").astype(str).str.lower()
-        df["AbstractText"] = df["Abstract"].fillna("").astype(str).str.lower()
-
-        best_labels: List[str] = []
-
-        for _, row in df.iterrows():
-            title_text = row["TitleText"]
-            abstract_text = row["AbstractText"]
-            combined_text = (title_text + " " + abstract_text).strip()
-
-            best_key = None
-            best_cat = "Unclassified"
-
-            for entry in self.query_dataset:
-                category, query = self._get_entry_fields(entry)
-
-                if self.mode == "title":
-                    matched = self._evaluate_query(query, title_text)
-                    title_match = matched
-                elif self.mode == "abstract":
-                    matched = self._evaluate_query(query, abstract_text)
-                    title_match = False  # no title preference in this mode
-                else:  # both
-                    title_match = self._evaluate_query(query, title_text)
-                    matched = title_match or self._evaluate_query(query, combined_text)
-
-                if not matched:
-                    continue
-
-                key = (
-                    self._priority_index(category),
-                    0 if (self.mode == "title" and matched) or (self.mode == "both" and title_match) else 1,
-                    -self._specificity(query),
-                    category
-                )
-
-                if (best_key is None) or (key < best_key):
-                    best_key = key
-                    best_cat = category
-
-            best_labels.append(best_cat)
-
-        df["Classification"] = best_labels
-        df.drop(columns=["TitleText", "AbstractText"], inplace=True)
-
+        df = as_frame(self.input_file)
+        missing = {c: "" for c in ("Title", "Abstract") if c not in df.columns}
+        if missing:
+            df = df.assign(**missing)
+
+        # lower-cased text kept as local Series so the input frame is not modified;
+        # object dtype so the patterns run through re, as the per-text matching did
+        title_texts = df["Title"].fillna("").astype(str).str.lower()
+        abstract_texts = df["Abstract"].fillna("").astype(str).str.lower()
+        combined_texts = (title_texts + " " + abstract_texts).str.strip().astype(object)
+        title_texts, abstract_texts = title_texts.astype(object), abstract_texts.astype(object)
+
+        # ranking key and rows of every (category, title match or not)
+        ranked = []
+        # every category queries the same columns: index them once if that pays off
+        indexes = {} if QUERY_INDEX and len(self.query_dataset) >= QUERY_INDEX_MIN_QUERIES else None
+        for entry in self.query_dataset:
+            category, query = self._get_entry_fields(entry)
+            node = compile_query(query, "substring")
+
+            if self.mode == "title":
+                matched = self._query_mask(node, title_texts, indexes)
+                title_match = matched
+            elif self.mode == "abstract":
+                matched = self._query_mask(node, abstract_texts, indexes)
+                title_match = np.zeros(len(df), dtype=bool)  # no title preference in this mode
+            else:  # both
+                title_match = self._query_mask(node, title_texts, indexes)
+                matched = title_match | self._query_mask(node, combined_texts, indexes)
+
+            for prefers_title, rows in ((0, matched & title_match), (1, matched & ~title_match)):
+                key = (self._priority_index(category), prefers_title, -self._specificity(query), category)
+                ranked.append((key, rows))
+
+        # best (lowest) key per row: the first ranked entry that matches it
+        best_labels = np.full(len(df), "Unclassified", dtype=object)
+        labelled = np.zeros(len(df), dtype=bool)
+        for (_, _, _, category), rows in sorted(ranked, key=lambda kv: kv[0]):
+            hit = rows & ~labelled
+            best_labels[hit] = category
+            labelled |= hit
+
+        df = df.assign(Classification=best_labels)
+
+        self.classified_df = df
         output_path = os.path.join(self.result_folder_path, self.output_file)
-        df.to_excel(output_path, index=False)
-        return output_path
+        return write_table(df, output_path)
 
     def print_queries(self):
         self._collapse_duplicate_categories()
@@ -1,15 +1,58 @@
 #Author: MarwanMohammed
+import hashlib
+import json
 import os
-import re
 import pandas as pd
-from config import BASE_DIR, RESULT_FOLDER, CONSOLIDATED_FILE, ALLOWED_EXTENSIONS, DOCUMENT_IDENTIFIER_MAPPING
+from joblib import Parallel, delayed
+from config import (
+    BASE_DIR, RESULT_FOLDER, CONSOLIDATED_FILE, ALLOWED_EXTENSIONS, DOCUMENT_IDENTIFIER_MAPPING,
+    CONSOLIDATION_MANIFEST, CONSOLIDATION_CACHE_FOLDER,
+)
+from dedup_keys import normalize_doi, source_rank, title_fingerprint
+from export_parser import BIBTEX, RIS, PUBMED, iter_export_records
+from storage import compact_corpus, write_table
+
+
+# Bump whenever the record builders change so cached shards are re-parsed.
+CACHE_VERSION = 1
+
+# DOCUMENT_IDENTIFIER_MAPPING compiled once into {lower-cased keyword: category};
+# the first category listing a keyword wins, as in the mapping's own order.
+DOCUMENT_IDENTIFIER_LOOKUP = {}
+for _category, _keywords in DOCUMENT_IDENTIFIER_MAPPING.items():
+    for _kw in _keywords:
+        DOCUMENT_IDENTIFIER_LOOKUP.setdefault(_kw.strip().lower(), _category)
+
+_YEAR_PATTERN = r"(\d{4})"
+
+CORPUS_COLUMNS = ["Year", "Title", "Abstract", "Keywords", "Author", "Document Identifier", "Journal", "DOI", "Source"]
+# Duplicate-filter match keys computed while streaming and emitted with the corpus.
+KEY_COLUMNS = ["DOI_norm", "Title_fp"]
+
+
+def _file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
 
 class PaperConsolidator:
-    def __init__(self, folder_names):
+    def __init__(self, folder_names, workers=1, incremental=True):
+        """
+        workers:     number of processes used to parse export files
+                     (1 = serial, -1 = all cores). Output is identical either way.
+        incremental: reuse the parsed-record shards of export files that did not
+                     change since the last run (see CONSOLIDATION_MANIFEST).
+        """
         self.base_directory = BASE_DIR
         self.folder_list = self._parse_folder_names(folder_names)
         self.allowed_extensions = ALLOWED_EXTENSIONS
+        self.workers = workers
+        self.incremental = incremental
+        self.cache_stats = {"reused": 0, "parsed": 0}
+        self.consolidated_df = None
 
     def _parse_folder_names(self, folder_names):
         if isinstance(folder_names, str):
@@ -19,130 +62,219 @@ class PaperConsolidator:
         else:
             raise ValueError("folder_names must be a string or list")
 
+    def standardize_document_identifier(self, df):
+        # Only the distinct identifiers (a few dozen) are looked up; rows are then mapped in one pass.
+        values = df['Document Identifier']
+        distinct = values.dropna().unique()
+        df['Document Identifier'] = values.map(
+            {v: DOCUMENT_IDENTIFIER_LOOKUP.get(str(v).strip().lower(), v) for v in distinct}
+        )
+        return df
+
     @staticmethod
-    def extract_bibtex_field(field_name, text):
-        pattern = rf"{re.escape(field_name)}\s*=\s*\{{(.*?)\}}"
-        match = re.search(pattern, text, re.DOTALL)
-        return match.group(1).replace("\n", " ").strip() if match else ""
+    def standardize_year(df):
+        """Reduce the raw date fields ('2020', '2020///', '2020 Jan 3') to an integer year column."""
+        years = df['Year'].astype("string").str.extract(_YEAR_PATTERN, expand=False)
+        df['Year'] = pd.to_numeric(years, errors="coerce").astype("Int64")
+        return df
+
+    def _bibtex_record(self, parsed, publisher):
+        doc_type, identifier, fields = parsed
+        return {
+            "Year": fields.get("year", ""),
+            "Title": fields.get("title", ""),
+            "Abstract": fields.get("abstract", ""),
+            "Keywords": fields.get("keywords", "").replace(", ", "; "),
+            "Author": fields.get("author", "").replace(" and ", "; "),
+            "Document Identifier": doc_type,
+            "Journal": fields.get("journal", ""),
+            "DOI": fields.get("doi", ""),
+            "Source": publisher
+        }
 
     @staticmethod
-    def extract_ris_field(field_name, entries):
-        values = [line[6:].strip() for line in entries if line.startswith(field_name)]
-        return "; ".join(values) if values else ""
+    def _tag_value(index, *tags, sep="; "):
+        """Joined values of the first tag present in a record's tag index."""
+        for tag in tags:
+            if index.get(tag):
+                return sep.join(index[tag])
+        return ""
+
+    def _ris_record(self, index, publisher):
+        return {
+            "Year": self._tag_value(index, "PY"),
+            "Title": self._tag_value(index, "TI", "T1"),
+            "Abstract": self._tag_value(index, "AB"),
+            "Keywords": self._tag_value(index, "KW"),
+            "Author": self._tag_value(index, "AU"),
+            "Document Identifier": self._tag_value(index, "TY"),
+            "Journal": self._tag_value(index, "JO", "T2"),
+            "DOI": self._tag_value(index, "DO", "DI"),
+            "Source": publisher
+        }
+
+    def _pubmed_record(self, index, publisher):
+        first = lambda tag: index[tag][0] if index.get(tag) else ""
+        aids = index.get("AID", [])
+        doi = next((a.split(" [doi]")[0] for a in aids if a.endswith("[doi]")), "")
+        return {
+            "Year": first("DP"),
+            "Title": first("TI"),
+            "Abstract": first("AB"),
+            "Keywords": self._tag_value(index, "OT"),
+            "Author": "",
+            "Document Identifier": "",
+            "Journal": first("JT"),
+            "DOI": doi,
+            "Source": publisher
+        }
+
+    def iter_file_records(self, file_path, publisher):
+        """Stream one export file and yield a record dict per entry."""
+        builders = {BIBTEX: self._bibtex_record, RIS: self._ris_record, PUBMED: self._pubmed_record}
+        for fmt, parsed in iter_export_records(file_path):
+            yield builders[fmt](parsed, publisher)
+
+    def parse_file(self, file_path, publisher):
+        """Parse one export file into a list of record dicts (runs inside a worker process)."""
+        return list(self.iter_file_records(file_path, publisher))
+
+    def _export_files(self):
+        """(file_path, publisher) for every export file, in folder order then file name order."""
+        files = []
+        for folder in self.folder_list:
+            subfolder_path = os.path.join(self.base_directory, folder)
+            if os.path.isdir(subfolder_path):
+                for filename in sorted(os.listdir(subfolder_path)):
+                    if filename.endswith(self.allowed_extensions):
+                        files.append((os.path.join(subfolder_path, filename), folder))
+        return files
+
+    def _iter_parsed_files(self, files):
+        """Yield the records of each file in `files` order, parsing in parallel when workers != 1."""
+        if self.workers == 1 or len(files) < 2:
+            for file_path, publisher in files:
+                yield self.iter_file_records(file_path, publisher)
+        else:
+            # joblib returns results in submission order, so the merge below
+            # sees files in exactly the same order as a serial run.
+            yield from Parallel(n_jobs=self.workers)(
+                delayed(self.parse_file)(file_path, publisher) for file_path, publisher in files
+            )
+
+    # ------------------------- incremental cache -------------------------
+
+    def _read_manifest(self, manifest_path):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return manifest.get("files", {}) if manifest.get("version") == CACHE_VERSION else {}
+
+    def _iter_cached_files(self, files, result_folder_path):
+        """
+        Like _iter_parsed_files, but only files whose size/mtime (or, failing
+        that, content hash) changed since the last run are parsed; the others
+        are loaded from their cached shard. Updates the manifest and drops
+        shards of files that no longer exist.
+        """
+        cache_folder = os.path.join(result_folder_path, CONSOLIDATION_CACHE_FOLDER)
+        manifest_path = os.path.join(result_folder_path, CONSOLIDATION_MANIFEST)
+        os.makedirs(cache_folder, exist_ok=True)
+        previous = self._read_manifest(manifest_path)
+
+        manifest, stale = {}, []
+        for file_path, publisher in files:
+            rel_path = os.path.relpath(file_path, self.base_directory)
+            st = os.stat(file_path)
+            entry = {
+                "publisher": publisher,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "shard": hashlib.sha1(rel_path.encode("utf-8")).hexdigest()[:16] + ".json",
+            }
+            old = previous.get(rel_path, {})
+            usable = old.get("publisher") == publisher and os.path.exists(os.path.join(cache_folder, entry["shard"]))
+            if usable and (old.get("size"), old.get("mtime_ns")) == (entry["size"], entry["mtime_ns"]):
+                entry["sha256"] = old["sha256"]
+            else:
+                entry["sha256"] = _file_sha256(file_path)
+                if not (usable and old.get("sha256") == entry["sha256"]):
+                    stale.append((file_path, publisher))
+            manifest[rel_path] = entry
+
+        parsed = {}
+        for (file_path, publisher), file_records in zip(stale, self._iter_parsed_files(stale)):
+            file_records = list(file_records)
+            rel_path = os.path.relpath(file_path, self.base_directory)
+            with open(os.path.join(cache_folder, manifest[rel_path]["shard"]), "w", encoding="utf-8") as f:
+                json.dump(file_records, f, ensure_ascii=False)
+            parsed[file_path] = file_records
+
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "files": manifest}, f, indent=2)
+        live_shards = {entry["shard"] for entry in manifest.values()}
+        for shard in os.listdir(cache_folder):
+            if shard not in live_shards:
+                os.remove(os.path.join(cache_folder, shard))
+
+        self.cache_stats = {"reused": len(files) - len(stale), "parsed": len(stale)}
+        print(f"Consolidation cache: {self.cache_stats['reused']} file(s) reused, "
+              f"{self.cache_stats['parsed']} file(s) re-parsed.")
+
+        for file_path, publisher in files:
+            if file_path in parsed:
+                yield parsed[file_path]
+            else:
+                rel_path = os.path.relpath(file_path, self.base_directory)
+                with open(os.path.join(cache_folder, manifest[rel_path]["shard"]), "r", encoding="utf-8") as f:
+                    yield json.load(f)
+
+    # ------------------------- exact duplicates -------------------------
 
     @staticmethod
-    def extract_multiline_field(start_pattern, lines):
-        extracting, extracted_text = False, []
-        for line in lines:
-            if line.startswith(start_pattern):
-                extracting = True
-                extracted_text.append(line[len(start_pattern):].strip())
-            elif extracting and re.match(r"^[A-Z]{2,4}  -", line):
-                break
-            elif extracting:
-                extracted_text.append(line.strip())
-        return " ".join(extracted_text) if extracted_text else ""
+    def _match_key(record):
+        """(normalized DOI, title fingerprint): the exact-duplicate key of DuplicateFilter."""
+        return normalize_doi(record["DOI"]), title_fingerprint(record["Title"])
 
-    def standardize_document_identifier(self, df):
-        def standardize(value):
-            if pd.isna(value):
-                return value
-            value_lower = str(value).strip().lower()
-            for category, keywords in DOCUMENT_IDENTIFIER_MAPPING.items():
-                if any(kw.lower() == value_lower for kw in keywords):
-                    return category
-            return value
-
-        df['Document Identifier'] = df['Document Identifier'].apply(standardize)
-        return df
+    @staticmethod
+    def _record_rank(record):
+        """
+        How DuplicateFilter ranks records sharing a key (their DOIs are equal):
+        longer abstract first, then the preferred source.
+        """
+        return len(record["Abstract"]), source_rank(record["Source"])
+
+    # ------------------------- main API -------------------------
 
     def consolidate(self):
         result_folder_path = os.path.join(self.base_directory, RESULT_FOLDER)
         os.makedirs(result_folder_path, exist_ok=True)
         consolidated_output = os.path.join(result_folder_path, CONSOLIDATED_FILE)
         records = []
-        processed_entries = set()
-        for folder in self.folder_list:
-            subfolder_path = os.path.join(self.base_directory, folder)
-            if os.path.isdir(subfolder_path):
-                publisher = folder
-                for filename in os.listdir(subfolder_path):
-                    if filename.endswith(self.allowed_extensions):
-                        file_path = os.path.join(subfolder_path, filename)
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            content = f.read().lstrip()
-                        is_bibtex = content.startswith("@")
-                        is_ris = bool(re.search(r'^TY  -', content, re.MULTILINE))
-                        is_pubmed = content.startswith("PMID-")
-                        if is_bibtex:
-                            bib_entries = re.findall(r'@(\w+)\s*{\s*([^,]+),\s*(.*?)}\s*\n', content, flags=re.DOTALL)
-                            for doc_type, identifier, entry in bib_entries:
-                                title = self.extract_bibtex_field("title", entry)
-                                doi = self.extract_bibtex_field("doi", entry)
-                                unique_key = (title, doi)
-                                if unique_key in processed_entries:
-                                    continue
-                                processed_entries.add(unique_key)
-                                records.append({
-                                    "Year": self.extract_bibtex_field("year", entry),
-                                    "Title": title,
-                                    "Abstract": self.extract_bibtex_field("abstract", entry),
-                                    "Keywords": self.extract_bibtex_field("keywords", entry).replace(", ", "; "),
-                                    "Author": self.extract_bibtex_field("author", entry).replace(" and ", "; "),
-                                    "Document Identifier": doc_type,
-                                    "Journal": self.extract_bibtex_field("journal", entry),
-                                    "DOI": doi,
-                                    "Source": publisher
-                                })
-                        elif is_ris:
-                            ris_entries = content.split("ER  -") if "ER  -" in content else content.split("\n\n")
-                            for entry in ris_entries:
-                                if not entry.strip():
-                                    continue
-                                lines = entry.strip().split("\n")
-                                title = self.extract_ris_field("TI  -", lines) or self.extract_ris_field("T1  -", lines)
-                                doi = self.extract_ris_field("DO  -", lines) or self.extract_ris_field("DI  -", lines)
-                                unique_key = (title, doi)
-                                if unique_key in processed_entries:
-                                    continue
-                                processed_entries.add(unique_key)
-                                records.append({
-                                    "Year": self.extract_ris_field("PY  -", lines),
-                                    "Title": title,
-                                    "Abstract": self.extract_ris_field("AB  -", lines),
-                                    "Keywords": self.extract_ris_field("KW  -", lines),
-                                    "Author": self.extract_ris_field("AU  -", lines),
-                                    "Document Identifier": self.extract_ris_field("TY  -", lines),
-                                    "Journal": self.extract_ris_field("JO  -", lines) or self.extract_ris_field("T2  -", lines),
-                                    "DOI": doi,
-                                    "Source": publisher
-                                })
-                        elif is_pubmed:
-                            pubmed_entries = content.split("\n\n")
-                            for entry in pubmed_entries:
-                                lines = entry.split("\n")
-                                title = self.extract_multiline_field("TI  -", lines)
-                                doi_field = self.extract_multiline_field("AID -", lines)
-                                doi = doi_field.split(" [doi]")[0] if doi_field else ""
-                                unique_key = (title, doi)
-                                if unique_key in processed_entries:
-                                    continue
-                                processed_entries.add(unique_key)
-                                full_date = self.extract_multiline_field("DP  -", lines)
-                                date_parts = full_date.split()
-                                extracted_date = date_parts[0] if date_parts else ""
-                                records.append({
-                                    "Year": extracted_date,
-                                    "Title": title,
-                                    "Abstract": self.extract_multiline_field("AB  -", lines),
-                                    "Keywords": self.extract_multiline_field("OT  -", lines),
-                                    "Author": "",
-                                    "Document Identifier": "",
-                                    "Journal": self.extract_multiline_field("JT  -", lines),
-                                    "DOI": doi,
-                                    "Source": publisher
-                                })
-        df = pd.DataFrame(records, columns=["Year", "Title", "Abstract", "Keywords", "Author", "Document Identifier", "Journal", "DOI", "Source"])
+        processed_entries = {}  # match key -> position in records
+        files = self._export_files()
+        if self.incremental:
+            parsed_files = self._iter_cached_files(files, result_folder_path)
+        else:
+            parsed_files = self._iter_parsed_files(files)
+            self.cache_stats = {"reused": 0, "parsed": len(files)}
+        dropped = 0
+        for file_records in parsed_files:
+            for record in file_records:
+                doi_norm, title_fp = unique_key = self._match_key(record)
+                seen = processed_entries.get(unique_key)
+                if seen is None:
+                    processed_entries[unique_key] = len(records)
+                    records.append({**record, "DOI_norm": doi_norm, "Title_fp": title_fp})
+                elif self._record_rank(record) > self._record_rank(records[seen]):
+                    # keep the record the duplicate filter would elect, at the first one's position
+                    records[seen] = {**record, "DOI_norm": doi_norm, "Title_fp": title_fp}
+                dropped += seen is not None
+        print(f"Consolidation: {len(records)} record(s), {dropped} exact duplicate(s) dropped.")
+        df = pd.DataFrame(records, columns=CORPUS_COLUMNS + KEY_COLUMNS)
         df = self.standardize_document_identifier(df)
-        df.to_excel(consolidated_output, index=False)
-        return consolidated_output
\ No newline at end of file
+        df = compact_corpus(self.standardize_year(df))
+        self.consolidated_df = df
+        return write_table(df, consolidated_output)
@@ -0,0 +1,191 @@
+# pipeline.py
+# Content-addressed DAG runner for the full pipeline:
+#   consolidate -> dedup -> stage1 -> stage2 -> stage3 -> classify -> analysis
+#
+# Each node is keyed by the hash of (its input files, the config.py values it
+# depends on, the source of the modules it runs). A node only re-executes when
+# that key differs from the one recorded in results/PIPELINE_STATE_FILE or when
+# one of its outputs is missing, so editing e.g. Sorting_Stage re-runs only
+# classification and the analysis downstream of it. Input tables are keyed by
+# their content, so a node whose re-run left its output table unchanged does not
+# invalidate the nodes downstream (xlsx files embed their write time, so they are
+# hashed as tables rather than as bytes).
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+import config
+from config import BASE_DIR, RESULT_FOLDER, PIPELINE_STATE_FILE
+from storage import read_table, resolve_table
+
+
+def _sha256_files(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode("utf-8"))
+        if path.lower().endswith(".xlsx"):
+            digest.update(_table_digest(path))
+            continue
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _table_digest(path):
+    """Digest of the columns and cell values of a stored table, independent of file metadata."""
+    df = read_table(path)
+    digest = hashlib.sha256(json.dumps([str(c) for c in df.columns]).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.digest()
+
+
+def _sha256_json(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class Node:
+    def __init__(self, name, run, deps=(), config_values=None, code=(), sources=None):
+        """
+        name:          node id used in the state file and in logs
+        run:           callable(inputs) -> list of output paths; `inputs` is the
+                       list of primary outputs (first path) of `deps`, in order
+        deps:          names of upstream nodes
+        config_values: {name: value} of the settings the node depends on
+        code:          module files (relative to BASE_DIR) whose source is part of the key
+        sources:       callable returning extra input files (e.g. raw exports)
+        """
+        self.name = name
+        self.run = run
+        self.deps = list(deps)
+        self.config_values = config_values or {}
+        self.code = list(code)
+        self.sources = sources
+
+
+class DagRunner:
+    def __init__(self, nodes, force=False):
+        self.nodes = {node.name: node for node in nodes}
+        self.order = [node.name for node in nodes]  # nodes are given in topological order
+        self.force = force
+        self.result_folder_path = os.path.join(BASE_DIR, RESULT_FOLDER)
+        self.state_path = os.path.join(self.result_folder_path, PIPELINE_STATE_FILE)
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        os.makedirs(self.result_folder_path, exist_ok=True)
+        with open(self.state_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+
+    def _key_parts(self, node, outputs):
+        input_files = []
+        for dep in node.deps:
+            input_files.extend(outputs[dep])
+        if node.sources is not None:
+            input_files.extend(node.sources())
+        return {
+            "inputs": _sha256_files(input_files),
+            "config": _sha256_json(node.config_values),
+            "code": _sha256_files([os.path.join(BASE_DIR, c) for c in node.code]),
+        }
+
+    def run(self):
+        """Run every invalidated node in order; returns {node name: output paths}."""
+        state = self._load_state()
+        outputs = {}
+        for name in self.order:
+            node = self.nodes[name]
+            parts = self._key_parts(node, outputs)
+            key = _sha256_json(parts)
+            previous = state.get(name, {})
+            cached = [resolve_table(p) or p for p in previous.get("outputs", [])]
+            if not self.force and previous.get("key") == key and cached and all(os.path.exists(p) for p in cached):
+                print(f"[pipeline] {name}: up to date, reusing {os.path.basename(cached[0])}")
+                outputs[name] = cached
+                continue
+
+            changed = [part for part, value in parts.items() if previous.get("parts", {}).get(part) != value]
+            reason = "forced" if self.force else ("first run" if not previous else "changed " + ", ".join(changed or ["outputs missing"]))
+            print(f"[pipeline] {name}: running ({reason})")
+            primary_inputs = [outputs[dep][0] for dep in node.deps]
+            outputs[name] = [resolve_table(p) or p for p in node.run(primary_inputs)]
+            state[name] = {"key": key, "parts": parts, "outputs": outputs[name]}
+            self._save_state(state)
+        return outputs
+
+
+def build_pipeline(folder_names=config.FOLDER_NAMES, classify_mode="both", start_year=config.START_YEAR,
+                   end_year=config.END_YEAR, workers=1):
+    """The standard consolidate -> ... -> analysis DAG."""
+    from paper_consolidator import PaperConsolidator
+    from duplicate_filter import DuplicateFilter
+    from dedup_keys import PREFERRED_SOURCES
+    from related_paper_filter import RelatedPaperFilter
+    from paper_classifier import PaperClassifier
+    from matrices_evaluation import MatricesEvaluation
+
+    consolidator = PaperConsolidator(folder_names=folder_names, workers=workers)
+    result_folder_path = os.path.join(BASE_DIR, RESULT_FOLDER)
+
+    def export_files():
+        return [path for path, _ in consolidator._export_files()]
+
+    def run_stage(stage):
+        def run(inputs):
+            all_path, filtered_path = RelatedPaperFilter(input_file=inputs[0]).run_single_stage(stage)
+            return [filtered_path, all_path]
+        return run
+
+    def run_analysis(inputs):
+        MatricesEvaluation(inputs[0]).analyze(query="Pipeline / Classified Output",
+                                              start_year=int(start_year), end_year=int(end_year))
+        return [os.path.join(result_folder_path, f) for f in (
+            config.NUMERICAL_ANALYSIS_SUMMARY, config.PAPERS_PER_YEAR_PLOT,
+            config.DOCUMENT_IDENTIFIER_DISTRIBUTION_PLOT, config.SOURCE_DISTRIBUTION_PLOT)]
+
+    stage_queries = {1: config.STAGE1, 2: config.STAGE2, 3: config.STAGE3}
+    # every node writing tables depends on the backend they are written with
+    storage = {"STORAGE_FORMAT": config.STORAGE_FORMAT, "EXPORT_XLSX": config.EXPORT_XLSX}
+    nodes = [
+        Node("consolidate", lambda inputs: [consolidator.consolidate()],
+             config_values={"FOLDER_NAMES": consolidator.folder_list,
+                            "ALLOWED_EXTENSIONS": config.ALLOWED_EXTENSIONS,
+                            "DOCUMENT_IDENTIFIER_MAPPING": config.DOCUMENT_IDENTIFIER_MAPPING,
+                            "PREFERRED_SOURCES": PREFERRED_SOURCES, **storage},
+             code=["paper_consolidator.py", "export_parser.py", "dedup_keys.py", "storage.py"], sources=export_files),
+        Node("dedup", lambda inputs: list(reversed(DuplicateFilter(input_excel=inputs[0], workers=workers).filter_duplicates())),
+             deps=["consolidate"],
+             config_values={"TITLES_TO_REMOVE": config.TITLES_TO_REMOVE,
+                            "ABSTRACTS_TO_REMOVE": config.ABSTRACTS_TO_REMOVE,
+                            "PREFERRED_SOURCES": PREFERRED_SOURCES,
+                            "TITLE_LSH": [config.TITLE_LSH, config.TITLE_LSH_THRESHOLD, config.TITLE_LSH_BANDS,
+                                          config.TITLE_LSH_ROWS, config.TITLE_LSH_SHINGLE_SIZE],
+                            "ABSTRACT_SIMILARITY": [config.ABSTRACT_SIMILARITY, config.ABSTRACT_SIMILARITY_THRESHOLD,
+                                                    config.ABSTRACT_SIMILARITY_TOP_K, config.ABSTRACT_SIMILARITY_MIN_WORDS],
+                            **storage},
+             code=["duplicate_filter.py", "dedup_keys.py", "minhash_lsh.py", "abstract_similarity.py",
+                   "dedup_index.py", "storage.py"]),
+    ]
+    previous = "dedup"
+    for stage in (1, 2, 3):
+        nodes.append(Node(f"stage{stage}", run_stage(stage), deps=[previous],
+                          config_values={f"STAGE{stage}": stage_queries[stage], **storage},
+                          code=["related_paper_filter.py", "query_compiler.py", "inverted_index.py", "storage.py"]))
+        previous = f"stage{stage}"
+    nodes.append(Node("classify", lambda inputs: [PaperClassifier(input_file=inputs[0], mode=classify_mode).classify()],
+                      deps=["stage3"],
+                      config_values={"Sorting_Stage": config.Sorting_Stage, "mode": classify_mode, **storage},
+                      code=["paper_classifier.py", "query_compiler.py", "inverted_index.py", "storage.py"]))
+    nodes.append(Node("analysis", run_analysis, deps=["classify"],
+                      config_values={"start_year": int(start_year), "end_year": int(end_year)},
+                      code=["matrices_evaluation.py", "storage.py"]))
+    return nodes
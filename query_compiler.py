@@ -0,0 +1,392 @@
+# query_compiler.py
+# Boolean query compiler for the search strings in config.py (STAGE1-3,
+# Sorting_Stage), shared by RelatedPaperFilter and PaperClassifier.
+#
+# Syntax: terms combined with OR, AND and ANDNOT (or NotAND), grouped with
+# parentheses to any depth. OR binds tighter than AND / ANDNOT, as in Scopus
+# and as the stage queries have always been read: "A OR B AND C" is
+# "(A OR B) AND C". AND and ANDNOT share one level and associate left.
+# Operators are upper-case words. A term is the text between operators and
+# parentheses: one or more words, or a quoted phrase ("..." or '...');
+# '*' is a wildcard.
+#
+# A query is parsed once (cached per query and term style) into an AST that
+# evaluates a whole text column (one vectorized str.contains pass per OR group,
+# the group's terms compiled into a single trie regex), an
+# inverted_index.InvertedIndex of such a column (posting-list operations), or
+# a single text, short-circuiting with precompiled patterns.
+
+import re
+import time
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Term styles: how a term becomes a regex (always matched case-insensitively).
+#   "word":      plain terms match whole words; '*' matches any run of word
+#                characters where it stands and drops the word boundaries
+#                (RelatedPaperFilter)
+#   "substring": plain terms match anywhere; a trailing '*' matches the words
+#                starting with the stem (PaperClassifier)
+# Quoted phrases match whole words in both styles.
+TERM_STYLES = ("word", "substring")
+
+OPERATORS = {"AND": "AND", "OR": "OR", "ANDNOT": "ANDNOT", "NotAND": "ANDNOT"}
+
+# Regex atoms of a term besides its (escaped) characters
+BOUNDARY, WILDCARD = r'\b', r'\w*'
+
+# The same atoms for RE2, which evaluates str.contains on pyarrow-backed string
+# columns and reads \w and \b as ASCII only, where re reads them as Unicode.
+# RE2 has no lookaround, so a boundary consumes the character on its far side
+# (or the end of the text); that is equivalent when only the existence of a
+# match counts.
+_RE2_WORD = r'[\p{L}\p{N}_]'
+_RE2_WILDCARD = _RE2_WORD + '*'
+_RE2_BEFORE_WORD, _RE2_AFTER_WORD = r'(?:^|[^\p{L}\p{N}_])', r'(?:[^\p{L}\p{N}_]|$)'
+_WORD_CHAR = re.compile(r'\w')
+_END = None  # trie key marking the end of a term
+
+# AND operands run most selective first. The selectivity is estimated on an
+# evenly spaced sample of SELECTIVITY_SAMPLE texts when scanning (not for columns
+# under four times that size) and from document frequencies on an inverted index.
+SELECTIVITY_SAMPLE = 1000
+
+_TOKEN = re.compile(r'''\s*(?:(?P<paren>[()])|(?P<quoted>"[^"]*"|'[^']*')(?=[\s()]|$)|(?P<word>[^\s()]+))''')
+
+
+def _is_quoted(text):
+    return (text.startswith('"') and text.endswith('"')) or (text.startswith("'") and text.endswith("'"))
+
+
+def term_atoms(text, style="word"):
+    """A term as a sequence of regex atoms: characters, BOUNDARY (\\b) and WILDCARD (\\w*)."""
+    if style == "word":
+        if _is_quoted(text):
+            return [BOUNDARY, *text[1:-1], BOUNDARY]
+        atoms = [WILDCARD if ch == "*" else ch for ch in text]
+        return atoms if "*" in text else [BOUNDARY, *atoms, BOUNDARY]
+    if style == "substring":
+        if _is_quoted(text):
+            return [BOUNDARY, *text[1:-1].strip(), BOUNDARY]
+        if text.endswith("*"):
+            return [BOUNDARY, *text[:-1], WILDCARD]
+        return list(text)
+    raise ValueError(f"term style must be one of {TERM_STYLES}, got {style!r}")
+
+
+def _atom_regex(atom):
+    return re.escape(atom) if len(atom) == 1 else atom  # characters are escaped, regex atoms kept
+
+
+def atoms_regex(atoms):
+    return "".join(_atom_regex(a) for a in atoms)
+
+
+def re2_atoms(atoms):
+    """
+    A term's atoms with BOUNDARY and WILDCARD spelled for RE2 (see _RE2_WORD),
+    or None if a boundary is not next to a character of the term.
+    """
+    out = []
+    for i, atom in enumerate(atoms):
+        if atom == WILDCARD:
+            atom = _RE2_WILDCARD
+        elif atom == BOUNDARY:
+            inner = atoms[i + 1] if i == 0 else atoms[i - 1] if i == len(atoms) - 1 else None
+            if inner is None or len(inner) != 1:
+                return None
+            if not _WORD_CHAR.match(inner):  # e.g. "C++": a word character must follow
+                atom = _RE2_WORD
+            else:
+                atom = _RE2_BEFORE_WORD if i == 0 else _RE2_AFTER_WORD
+        out.append(atom)
+    return out
+
+
+def _contains(texts, regex, re2_regex):
+    """
+    texts.str.contains(regex), case-insensitive, with `regex` read the way re
+    reads it: pyarrow-backed columns get its RE2 spelling `re2_regex`, or are
+    scanned as Python strings when there is none.
+    """
+    if getattr(texts.dtype, "storage", None) == "pyarrow" or isinstance(texts.dtype, pd.ArrowDtype):
+        if re2_regex is None:
+            texts = texts.astype(object)
+        else:
+            regex = re2_regex
+    return texts.str.contains(regex, case=False, na=False, regex=True)
+
+
+def trie_regex(atom_lists):
+    """
+    One alternation matching wherever any of the terms (`atom_lists`)
+    matches, with shared prefixes factored out (a trie), so the regex engine
+    tests each common prefix once per position instead of once per term. A
+    term that is a prefix of another one (or ends in '*' where the other
+    continues) already decides the match, so the longer one is dropped. The
+    patterns are matched case-insensitively, so the trie is built over
+    lower-cased characters.
+    """
+    trie = {}
+    for atoms in atom_lists:
+        node = trie
+        for atom in atoms:
+            node = node.setdefault(atom.lower() if len(atom) == 1 else atom, {})
+        node[_END] = {}
+
+    def emit(node):
+        if _END in node or any(_END in node.get(w, {}) for w in (WILDCARD, _RE2_WILDCARD)):  # \w* may match nothing
+            return ""
+        parts = [_atom_regex(atom) + emit(child) for atom, child in node.items()]
+        return parts[0] if len(parts) == 1 else "(?:" + "|".join(parts) + ")"
+
+    return emit(trie)
+
+
+def _record(trace, node, rows, result, started, estimate=None, negated=False):
+    """Appends one evaluation step to `trace` (when collecting one); `rows`: its input rows, None for all."""
+    if trace is not None:
+        result = np.array(result, dtype=bool)  # a copy: And updates its result in place
+        matched = result if not negated else ~result if rows is None else rows & ~result
+        trace.append({"node": node, "rows": rows, "matched": matched, "group": node.describe(), "negated": negated,
+                      "estimate": estimate, "rows_in": len(result) if rows is None else int(rows.sum()),
+                      "rows_out": int(result.sum()), "seconds": time.perf_counter() - started})
+
+
+def leaf_terms(node):
+    """The Term leaves of a node, in query order."""
+    if isinstance(node, Term):
+        return [node]
+    children = node.children if isinstance(node, Or) else node.positive + node.negative
+    return [t for c in children for t in leaf_terms(c)]
+
+
+class Term:
+    def __init__(self, text, style):
+        self.text = text
+        self.atoms = term_atoms(text, style)
+        self.regex = atoms_regex(self.atoms)
+        self.pattern = re.compile(self.regex, re.IGNORECASE)
+        re2 = re2_atoms(self.atoms)
+        self.re2_regex = None if re2 is None else atoms_regex(re2)
+
+    def mask(self, texts, trace=None):
+        started = time.perf_counter()
+        result = _contains(texts, self.regex, self.re2_regex)
+        _record(trace, self, None, result, started)
+        return result
+
+    def evaluate(self, index, rows=None, trace=None):
+        started = time.perf_counter()
+        result = index.term_mask(self) if rows is None else index.term_mask(self) & rows
+        _record(trace, self, rows, result, started)
+        return result
+
+    def frequency(self, index):
+        return index.term_frequency(self)
+
+    def matches(self, text):
+        return self.pattern.search(text) is not None
+
+    def describe(self):
+        return self.regex
+
+
+class Or:
+    """Any of `children`; the Term children are evaluated together as one trie regex."""
+    def __init__(self, children):
+        self.children = children
+        self.terms = [c for c in children if isinstance(c, Term)]
+        self.others = [c for c in children if not isinstance(c, Term)]
+        self.regex = trie_regex([t.atoms for t in self.terms]) if self.terms else None
+        self.pattern = re.compile(self.regex, re.IGNORECASE) if self.terms else None
+        re2 = [re2_atoms(t.atoms) for t in self.terms]
+        self.re2_regex = trie_regex(re2) if self.terms and None not in re2 else None
+
+    def mask(self, texts, trace=None):
+        started = time.perf_counter()
+        result = _contains(texts, self.regex, self.re2_regex) if self.terms else None
+        for child in self.others:
+            result = child.mask(texts) if result is None else (result | child.mask(texts))
+        _record(trace, self, None, result, started)
+        return result
+
+    def evaluate(self, index, rows=None, trace=None):
+        started = time.perf_counter()
+        result = np.zeros(index.n_docs, dtype=bool)
+        for child in self.children:
+            result |= child.evaluate(index)
+        if rows is not None:
+            result &= rows
+        _record(trace, self, rows, result, started)
+        return result
+
+    def frequency(self, index):
+        return min(index.n_docs, sum(c.frequency(index) for c in self.children))
+
+    def matches(self, text):
+        if self.pattern is not None and self.pattern.search(text):
+            return True
+        return any(child.matches(text) for child in self.others)
+
+    def describe(self):
+        return "({})".format(" OR ".join(c.describe() for c in self.children))
+
+
+class And:
+    """
+    All `positive` children and none of the `negative` ones (ANDNOT). The
+    positive children run most selective first, and every child only on the
+    rows the previous ones left.
+    """
+    def __init__(self, positive, negative=()):
+        self.positive = list(positive)
+        self.negative = list(negative)
+
+    def _steps(self, estimates):
+        """(child, negated, estimated match rate) in evaluation order."""
+        if estimates is None:
+            positive = [(c, False, None) for c in self.positive]
+        else:
+            positive = sorted(((c, False, e) for c, e in zip(self.positive, estimates)), key=lambda step: step[2])
+        return positive + [(c, True, None) for c in self.negative]
+
+    def mask(self, texts, trace=None):
+        estimates = None
+        if len(self.positive) > 1 and len(texts) >= 4 * SELECTIVITY_SAMPLE:
+            sample = texts.iloc[np.linspace(0, len(texts) - 1, SELECTIVITY_SAMPLE).astype(int)]
+            estimates = [float(c.mask(sample).mean()) for c in self.positive]
+
+        result = np.ones(len(texts), dtype=bool)
+        for child, negated, estimate in self._steps(estimates):
+            started = time.perf_counter()
+            before = result.copy() if trace is not None else None
+            rows = np.flatnonzero(result)
+            if len(rows):
+                hit = child.mask(texts if len(rows) == len(texts) else texts.iloc[rows]).to_numpy(dtype=bool)
+                result[rows] = ~hit if negated else hit
+            _record(trace, child, before, result, started, estimate, negated)
+        return pd.Series(result, index=texts.index)
+
+    def evaluate(self, index, rows=None, trace=None):
+        n_docs = max(index.n_docs, 1)
+        estimates = [c.frequency(index) / n_docs for c in self.positive] if len(self.positive) > 1 else None
+
+        result = np.ones(index.n_docs, dtype=bool) if rows is None else rows.copy()
+        for child, negated, estimate in self._steps(estimates):
+            started = time.perf_counter()
+            before = result.copy() if trace is not None else None
+            if result.any():
+                hit = child.evaluate(index)
+                result &= ~hit if negated else hit
+            _record(trace, child, before, result, started, estimate, negated)
+        return result
+
+    def frequency(self, index):
+        return min(c.frequency(index) for c in self.positive)
+
+    def matches(self, text):
+        return all(c.matches(text) for c in self.positive) and not any(c.matches(text) for c in self.negative)
+
+    def describe(self):
+        wrap = lambda c: c.describe() if isinstance(c, Or) else "({})".format(c.describe())
+        out = " AND ".join(wrap(c) for c in self.positive)
+        return "".join([out] + [" ANDNOT " + wrap(c) for c in self.negative])
+
+
+class _Parser:
+    def __init__(self, query, style):
+        self.query = query
+        self.style = style
+        self.tokens = []  # (kind, value, start, end)
+        pos = 0
+        while pos < len(query):
+            m = _TOKEN.match(query, pos)
+            if m is None or m.end() == pos:  # only trailing whitespace left
+                break
+            kind = m.lastgroup
+            value, start, end = m.group(kind), m.start(kind), m.end(kind)
+            if kind == "word" and value in OPERATORS:
+                kind, value = "op", OPERATORS[value]
+            self.tokens.append((kind, value, start, end))
+            pos = m.end()
+        self.i = 0
+
+    def _peek(self):
+        return self.tokens[self.i] if self.i < len(self.tokens) else (None, None, len(self.query), len(self.query))
+
+    def _error(self, message):
+        raise ValueError(f"{message} at position {self._peek()[2]} in query: {self.query!r}")
+
+    def parse(self):
+        node = self._and()
+        if self.i < len(self.tokens):
+            self._error(f"unexpected {self._peek()[1]!r}")
+        return node
+
+    def _and(self):
+        positive, negative = [self._or()], []
+        while self._peek()[0] == "op" and self._peek()[1] in ("AND", "ANDNOT"):
+            op = self._peek()[1]
+            self.i += 1
+            (positive if op == "AND" else negative).append(self._or())
+        if len(positive) == 1 and not negative:
+            return positive[0]
+        # flatten nested conjunctions: (A AND B) AND C == A AND B AND C
+        flat_pos, flat_neg = [], list(negative)
+        for child in positive:
+            if isinstance(child, And):
+                flat_pos += child.positive
+                flat_neg += child.negative
+            else:
+                flat_pos.append(child)
+        return And(flat_pos, flat_neg)
+
+    def _or(self):
+        children = [self._primary()]
+        while self._peek()[:2] == ("op", "OR"):
+            self.i += 1
+            children.append(self._primary())
+        if len(children) == 1:
+            return children[0]
+        flat = []
+        for child in children:
+            flat += child.children if isinstance(child, Or) else [child]
+        return Or(flat)
+
+    def _primary(self):
+        kind, value, start, _ = self._peek()
+        if (kind, value) == ("paren", "("):
+            self.i += 1
+            node = self._and()
+            if self._peek()[:2] != ("paren", ")"):
+                self._error("missing ')'")
+            self.i += 1
+            return node
+        if kind not in ("word", "quoted"):
+            self._error("expected a term" if kind is not None else "query ends where a term is expected")
+        end = start
+        while self._peek()[0] in ("word", "quoted"):
+            end = self._peek()[3]
+            self.i += 1
+        return Term(self.query[start:end], self.style)
+
+
+@lru_cache(maxsize=None)
+def compile_query(query, style="word"):
+    """
+    Parse `query` into its AST (Term / Or / And nodes). Every node has
+    mask(texts) -> boolean Series over a text Series, evaluate(index, rows)
+    -> boolean array over the texts of an InvertedIndex (within the `rows`
+    mask, if given), matches(text) -> bool and describe() -> the query with
+    each term shown as its regex. mask and evaluate take an optional `trace`
+    list, which receives one step per AND operand in evaluation order (or
+    one for the whole query if it is no AND): node, rows (its input rows
+    mask, None for all), matched (mask of the input rows the node matched),
+    group, negated, estimate, rows_in, rows_out and seconds. Raises ValueError on malformed queries.
+    """
+    if style not in TERM_STYLES:
+        raise ValueError(f"term style must be one of {TERM_STYLES}, got {style!r}")
+    return _Parser(query, style).parse()
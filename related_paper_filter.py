@@ -1,8 +1,10 @@
 # #Author: MarwanMohammed
 
+import json
+import time
+import numpy as np
 import pandas as pd
 import os
-import re
 from config import (
     BASE_DIR, RESULT_FOLDER,
     # staged queries
@@ -11,68 +13,80 @@ from config import (
     STAGE1_ALL_FILE, STAGE2_ALL_FILE, STAGE3_ALL_FILE,
     STAGE1_FILTERED_FILE, STAGE2_FILTERED_FILE, STAGE3_FILTERED_FILE,
     STAGE1_QUERY_LOG, STAGE2_QUERY_LOG, STAGE3_QUERY_LOG,
+    STAGE1_QUERY_STATS, STAGE2_QUERY_STATS, STAGE3_QUERY_STATS,
     # legacy compatibility
-    QUERY_LOG_FILE
+    QUERY_LOG_FILE,
+    QUERY_INDEX, QUERY_INDEX_MIN_QUERIES, QUERY_TERM_STATS
 )
+from inverted_index import InvertedIndex
+from query_compiler import Or, Term, compile_query, leaf_terms
+from storage import as_frame, write_table, table_exists
 
 STAGE_TO_QUERY = {1: STAGE1, 2: STAGE2, 3: STAGE3}
 STAGE_TO_ALL = {1: STAGE1_ALL_FILE, 2: STAGE2_ALL_FILE, 3: STAGE3_ALL_FILE}
 STAGE_TO_FILTERED = {1: STAGE1_FILTERED_FILE, 2: STAGE2_FILTERED_FILE, 3: STAGE3_FILTERED_FILE}
 STAGE_TO_LOG = {1: STAGE1_QUERY_LOG, 2: STAGE2_QUERY_LOG, 3: STAGE3_QUERY_LOG}
+STAGE_TO_STATS = {1: STAGE1_QUERY_STATS, 2: STAGE2_QUERY_STATS, 3: STAGE3_QUERY_STATS}
 
 class RelatedPaperFilter:
     def __init__(self, input_file, debug=False):
+        """input_file: path of the input table, or the DataFrame itself."""
         self.input_file = input_file
         self.debug = debug
         self.base_directory = BASE_DIR
         self.result_folder_path = os.path.join(self.base_directory, RESULT_FOLDER)
+        # Related-only frame of each stage run, for in-memory hand-off
+        self.related_frames = {}
+        # Inverted index of the last corpus queried, reused by chained stages;
+        # only used when enough stage queries share it to pay for its build
+        self._index = None
+        self._use_index = False
 
 
     def _create_output_folder(self):
         os.makedirs(self.result_folder_path, exist_ok=True)
 
-    def _build_condition(self, df, query, col_name):
-        q = query.strip()
-        if q.startswith("(") and q.endswith(")"):
-            q = q[1:-1].strip()
-        groups = [group.strip() for group in q.split("AND")]
-
-        overall_condition = None
-        processed_groups = []
-
-        for group in groups:
-            if group.startswith("(") and group.endswith(")"):
-                group = group[1:-1].strip()
-
-            keywords = [kw.strip() for kw in group.split("OR")]
-            processed_keywords = []
-            group_condition = None
-
-            for kw in keywords:
-                if (kw.startswith('"') and kw.endswith('"')) or (kw.startswith("'") and kw.endswith("'")):
-                    kw_clean = kw[1:-1]
-                    kw_regex = r'\b' + re.escape(kw_clean) + r'\b'
-                else:
-                    kw_clean = kw
-                    escaped_kw = re.escape(kw_clean)
-                    kw_regex = escaped_kw.replace(r'\*', r'\w*')
-                    if '*' not in kw:
-                        kw_regex = r'\b' + kw_regex + r'\b'
-
-                processed_keywords.append(kw_regex)
-                cond = df[col_name].str.contains(kw_regex, case=False, na=False, regex=True)
-                group_condition = cond if group_condition is None else (group_condition | cond)
-
-            processed_groups.append("({})".format(" OR ".join(processed_keywords)))
-            overall_condition = group_condition if overall_condition is None else (overall_condition & group_condition)
-
-            if self.debug:
-                print(f"  Group: {group} => Keywords: {processed_keywords}")
-
-        processed_query = " AND ".join(processed_groups)
-        return overall_condition, processed_query
+    def _text_index(self, text):
+        """
+        Inverted index covering the rows of `text` and their positions in it.
+        The index of the previous call is reused when `text` is a subset of its
+        rows with unchanged texts (the related rows of a chained stage).
+        """
+        if self._index is not None:
+            positions = self._index.texts.index.get_indexer(text.index) if self._index.texts.index.is_unique else None
+            if positions is not None and (positions >= 0).all():
+                indexed = self._index.texts.iloc[positions]
+                if indexed.reset_index(drop=True).equals(text.reset_index(drop=True)):
+                    return self._index, positions
+        self._index = InvertedIndex(text)
+        return self._index, slice(None)
+
+    def _build_condition(self, text, query, trace=None):
+        """
+        Boolean mask of the texts matching `query` and the query with every
+        keyword shown as its regex (for the query log). The query runs on an
+        inverted index of `text` (`_use_index`), else each OR group of keywords
+        is evaluated as one regex pass over `text`. AND groups run most
+        selective first, each on the rows the previous ones left; `trace`, if
+        given, receives their order, row counts and timings.
+        """
+        node = compile_query(query.strip(), "word")
+        processed_query = node.describe()
+        if isinstance(node, Term):
+            processed_query = f"({processed_query})"
 
-    def _save_query_log(self, stage, original_query, processed_query):
+        if self.debug:
+            print(f"  Query: {processed_query}")
+        if not self._use_index:
+            return node.mask(text, trace), processed_query
+        index, positions = self._text_index(text)
+        rows = None
+        if isinstance(positions, np.ndarray):
+            rows = np.zeros(index.n_docs, dtype=bool)
+            rows[positions] = True
+        return pd.Series(node.evaluate(index, rows, trace)[positions], index=text.index), processed_query
+
+    def _save_query_log(self, stage, original_query, processed_query, trace=()):
         log_file_path = os.path.join(self.result_folder_path, STAGE_TO_LOG.get(stage, QUERY_LOG_FILE))
         with open(log_file_path, "w", encoding="utf-8") as f:
             f.write(f"Stage: {stage}\n\n")
@@ -80,37 +94,99 @@ class RelatedPaperFilter:
             f.write(original_query + "\n\n")
             f.write("Processed Query:\n")
             f.write(processed_query + "\n")
+            if trace:
+                f.write("\nEvaluation Order:\n")
+                for i, step in enumerate(trace, 1):
+                    estimate = "" if step["estimate"] is None else f", estimated {step['estimate']:.1%} match"
+                    f.write(f"{i}. {'ANDNOT ' if step['negated'] else ''}{step['group']}\n")
+                    f.write(f"   {step['rows_in']} -> {step['rows_out']} rows in {step['seconds']:.3f} s{estimate}\n")
         if self.debug:
             print(f"Query log saved to {log_file_path}")
 
+    def _term_stats(self, step, text):
+        """
+        Hits, hits of no other keyword of the step (0: redundant in its group)
+        and seconds of every keyword of one evaluation step, over its input rows.
+        The keywords of a plain OR group can only hit rows the group matched,
+        so only those are searched; on the index the keyword masks are the
+        ones the query was evaluated with.
+        """
+        node = step["node"]
+        terms = leaf_terms(node)
+        plain = isinstance(node, Term) or (isinstance(node, Or) and not node.others)
+        rows = step["matched"] if plain else step["rows"]
+        if self._use_index:  # trace rows and term masks are over the index texts
+            masks = [self._index.term_mask(t) for t in terms]
+            masks = [m if rows is None else m & rows for m in masks]
+            seconds = [self._index.term_seconds[t.regex] for t in terms]
+        else:
+            searched = text if rows is None else text.iloc[np.flatnonzero(rows)]
+            masks, seconds = [], []
+            for t in terms:
+                started = time.perf_counter()
+                masks.append(t.mask(searched).to_numpy(dtype=bool))
+                seconds.append(time.perf_counter() - started)
+        matched_by = np.sum(masks, axis=0) if masks else 0
+        return [{"term": t.text, "regex": t.regex, "hits": int(m.sum()),
+                 "unique_hits": int((m & (matched_by == 1)).sum()), "seconds": round(sec, 6)}
+                for t, m, sec in zip(terms, masks, seconds)]
+
+    def _save_query_stats(self, stage, original_query, text, related_condition, trace):
+        """JSON companion of the query log: every AND step with its rows, hits and timing."""
+        steps = []
+        for i, step in enumerate(trace, 1):
+            entry = {"order": i, "group": step["group"], "negated": step["negated"],
+                     "estimated_match_rate": step["estimate"],
+                     "hits": step["rows_in"] - step["rows_out"] if step["negated"] else step["rows_out"],
+                     "rows_in": step["rows_in"], "rows_out": step["rows_out"],
+                     "seconds": round(step["seconds"], 6)}
+            if (self._use_index or QUERY_TERM_STATS) and step["rows_in"]:
+                entry["terms"] = self._term_stats(step, text)
+            steps.append(entry)
+        stats = {"stage": stage, "query": original_query,
+                 "engine": "inverted index" if self._use_index else "regex scan",
+                 "rows": len(text), "related": int(related_condition.sum()), "steps": steps}
+        stats_path = os.path.join(self.result_folder_path, STAGE_TO_STATS[stage])
+        with open(stats_path, "w", encoding="utf-8") as f:
+            json.dump(stats, f, indent=2)
+        if self.debug:
+            print(f"Query stats saved to {stats_path}")
+
     @staticmethod
     def _combine_cols(df):
-        df = df.copy()
-        for c in ("Title", "Abstract", "Keywords"):
-            if c not in df.columns:
-                df[c] = ""
-        df["combined"] = df["Title"].fillna('') + " " + df["Abstract"].fillna('') + " " + df["Keywords"].fillna('')
-        return df
-
-    def _apply_stage(self, df, stage: int):
+        """Title + Abstract + Keywords as one text Series; missing columns count as empty."""
+        combined = pd.Series("", index=df.index, dtype="str")
+        for i, c in enumerate(("Title", "Abstract", "Keywords")):
+            part = df[c].fillna('') if c in df.columns else ""
+            combined = part if i == 0 and c in df.columns else combined + " " + part
+        return combined
+
+    def _stage_condition(self, combined, stage: int):
+        """Related mask of the `combined` texts for one stage; writes the stage's query log."""
         if stage not in (1, 2, 3):
             raise ValueError("Stage must be 1, 2, or 3.")
 
         query = STAGE_TO_QUERY[stage]
-        df = self._combine_cols(df)
-
-        related_condition, processed_query = self._build_condition(df, query, 'combined')
-        self._save_query_log(stage, query, processed_query)
-
-        df_out = df.copy()
-        df_out["Related"] = related_condition.map({True: "Related", False: "Not Related"})
+        trace = []
+        related_condition, processed_query = self._build_condition(combined, query, trace)
+        self._save_query_log(stage, query, processed_query, trace)
+        self._save_query_stats(stage, query, combined, related_condition, trace)
+        return related_condition
+
+    def _write_stage(self, df, combined, related_condition, stage: int):
+        """Writes a stage's all / related-only tables for the rows of `df` (texts `combined`)."""
+        # assign() leaves `df` untouched without copying its data (copy-on-write)
+        missing = {c: "" for c in ("Title", "Abstract", "Keywords") if c not in df.columns}
+        df_out = df.assign(**missing, combined=combined,
+                           Related=related_condition.map({True: "Related", False: "Not Related"}))
 
         all_path = os.path.join(self.result_folder_path, STAGE_TO_ALL[stage])
-        df_out.to_excel(all_path, index=False)
+        all_path = write_table(df_out, all_path)
 
         related_df = df_out[df_out["Related"] == "Related"].drop(columns=["combined"])
+        self.related_frames[stage] = related_df
         filtered_path = os.path.join(self.result_folder_path, STAGE_TO_FILTERED[stage])
-        related_df.to_excel(filtered_path, index=False)
+        filtered_path = write_table(related_df, filtered_path)
 
         if self.debug:
             print(f"[Stage {stage}] Saved all -> {all_path}")
@@ -118,23 +194,50 @@ class RelatedPaperFilter:
 
         return all_path, filtered_path
 
+    def _apply_stage(self, df, stage: int):
+        combined = self._combine_cols(df)
+        related_condition = self._stage_condition(combined, stage)
+        return self._write_stage(df, combined, related_condition, stage)
+
     # ---------- public methods (kept + new) ----------
 
 
     # New staged interface
+    def _plan_queries(self, n_queries):
+        """Query on an inverted index only when `n_queries` stage queries share its build."""
+        self._use_index = QUERY_INDEX and n_queries >= QUERY_INDEX_MIN_QUERIES
+
     def run_single_stage(self, stage: int):
+        self._plan_queries(1)
         self._create_output_folder()
-        df = pd.read_excel(self.input_file)
+        df = as_frame(self.input_file)
         return self._apply_stage(df, stage)
 
     def run_chained(self, stages=(1, 2, 3)):
+        """
+        Run `stages` in order, each on the rows related at the previous one. The
+        corpus is read and its combined text built once, each stage evaluates
+        only the rows that survived so far, and the stage tables are written at
+        the end from the resulting masks.
+        """
+        self._plan_queries(len(stages))
         self._create_output_folder()
-        df = pd.read_excel(self.input_file)
+        df = as_frame(self.input_file)
+        combined = self._combine_cols(df)
+
+        surviving = np.ones(len(df), dtype=bool)
+        texts, conditions = {}, {}
+        for s in stages:
+            texts[s] = combined[surviving]
+            conditions[s] = self._stage_condition(texts[s], s)
+            surviving[surviving] = conditions[s].to_numpy(dtype=bool)
+            if self.debug:
+                print(f"[Stage {s}] {int(surviving.sum())} of {len(texts[s])} rows related")
+
         outputs = {}
         for s in stages:
-            all_p, filt_p = self._apply_stage(df, s)
-            outputs[s] = (all_p, filt_p)
-            df = pd.read_excel(filt_p)  # chain filtered into next stage
+            outputs[s] = self._write_stage(df, texts[s], conditions[s], s)
+            df = self.related_frames[s]  # rows of the next stage, with this stage's Related column
         return outputs
 
 
@@ -150,7 +253,7 @@ class RelatedPaperFilter:
             from config import FILTERED_DUPLICATE_FILE
             dedup_path = os.path.join(self.result_folder_path, FILTERED_DUPLICATE_FILE)
 
-        if not os.path.exists(dedup_path):
+        if not table_exists(dedup_path):
             raise FileNotFoundError(f"De-duplicated file not found at: {dedup_path}")
 
         # Re-bind the input file to the de-duplicated file and chain all stages
@@ -0,0 +1,189 @@
+# storage.py
+# Read/write helpers for the intermediate tables of the pipeline.
+#
+# Stage file names in config.py keep their ".xlsx" names; the backend chosen
+# by STORAGE_FORMAT only swaps the extension. Readers accept any of the
+# names, so a module handed "01_consolidated_papers.xlsx" transparently
+# reads "01_consolidated_papers.parquet" when that is what was written.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from config import STORAGE_FORMAT, EXPORT_XLSX
+
+EXTENSIONS = {"parquet": ".parquet", "feather": ".arrow", "xlsx": ".xlsx"}
+
+# Corpus column layout (see compact_corpus)
+CATEGORICAL_COLUMNS = ("Source", "Document Identifier", "Journal")
+TEXT_COLUMNS = ("Title", "Abstract", "Keywords", "Author", "DOI")
+
+# Background writer used in in-memory pipeline mode (see enable_background_writes).
+_writer = None
+_pending = []
+
+
+def _backend():
+    fmt = (STORAGE_FORMAT or "xlsx").strip().lower()
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"STORAGE_FORMAT must be one of {sorted(EXTENSIONS)}, got {STORAGE_FORMAT!r}")
+    if fmt != "xlsx":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print(f"Warning: pyarrow is not installed; STORAGE_FORMAT={fmt!r} falls back to xlsx.")
+            return "xlsx"
+    return fmt
+
+
+def _with_ext(path, ext):
+    return os.path.splitext(path)[0] + ext
+
+
+def _arrow_safe(df):
+    """Arrow needs one type per column; Excel round-trips can leave mixed int/str object columns."""
+    mixed = [
+        c for c in df.columns
+        if df[c].dtype == object and pd.api.types.infer_dtype(df[c], skipna=True) not in ("string", "empty")
+    ]
+    if not mixed:
+        return df
+    df = df.copy()
+    for c in mixed:
+        df[c] = df[c].map(lambda v: v if pd.isna(v) else str(v))
+    return df
+
+
+def storage_path(path):
+    """The path a table named `path` is actually stored at with the configured backend."""
+    return _with_ext(path, EXTENSIONS[_backend()])
+
+
+def resolve_table(path):
+    """
+    Return the existing file for a table name: the configured backend first,
+    then the name as given, then any other supported format. None if absent.
+    """
+    candidates = [storage_path(path), path] + [_with_ext(path, ext) for ext in EXTENSIONS.values()]
+    for candidate in candidates:
+        if candidate and os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def table_exists(path):
+    return resolve_table(path) is not None
+
+
+def _text_dtype():
+    """Arrow-backed strings with NaN as missing value (pandas' default 'str' when pyarrow is present)."""
+    try:
+        return pd.StringDtype("pyarrow", na_value=float("nan"))
+    except (ImportError, TypeError):
+        return None
+
+
+def compact_corpus(df):
+    """
+    Give the paper corpus a compact layout, in place: categoricals for the
+    low-cardinality fields, Arrow-backed strings for the text fields and a
+    nullable integer Year. Columns already in that layout are left alone.
+    """
+    for c in CATEGORICAL_COLUMNS:
+        if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype("category")
+    text_dtype = _text_dtype()
+    if text_dtype is not None:
+        for c in TEXT_COLUMNS:
+            if c in df.columns and df[c].dtype != text_dtype:
+                df[c] = df[c].astype(text_dtype)
+    if "Year" in df.columns and not pd.api.types.is_integer_dtype(df["Year"].dtype):
+        df["Year"] = pd.to_numeric(df["Year"], errors="coerce").round().astype("Int64")
+    return df
+
+
+def as_frame(source):
+    """Accept either a DataFrame handed over in memory or a table path; returns the compact corpus layout."""
+    if isinstance(source, pd.DataFrame):
+        return compact_corpus(source)
+    return compact_corpus(read_table(source))
+
+
+def read_table(path, columns=None):
+    """Read a stage table written by write_table (or any .xlsx/.parquet/.arrow file)."""
+    resolved = resolve_table(path)
+    if resolved is None:
+        raise FileNotFoundError(f"No table found for: {path}")
+    ext = os.path.splitext(resolved)[1].lower()
+    if ext == ".parquet":
+        return pd.read_parquet(resolved, columns=columns)
+    if ext in (".arrow", ".feather"):
+        return pd.read_feather(resolved, columns=columns)
+    df = pd.read_excel(resolved)
+    return df[columns] if columns is not None else df
+
+
+def read_columns(path):
+    """Column names of a stored table without loading its rows where the format allows it."""
+    resolved = resolve_table(path)
+    if resolved is None:
+        raise FileNotFoundError(f"No table found for: {path}")
+    ext = os.path.splitext(resolved)[1].lower()
+    if ext == ".parquet":
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(resolved).names)
+    if ext in (".arrow", ".feather"):
+        import pyarrow.feather as feather
+        return list(feather.read_table(resolved).column_names)
+    return list(pd.read_excel(resolved, nrows=0).columns)
+
+
+def enable_background_writes(enabled=True):
+    """
+    Make write_table return immediately and write on a background thread.
+    Call wait_for_writes() before anything reads the files back.
+    """
+    global _writer
+    if enabled and _writer is None:
+        _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="table-writer")
+    elif not enabled and _writer is not None:
+        wait_for_writes()
+        _writer.shutdown()
+        _writer = None
+
+
+def wait_for_writes():
+    """Block until every queued background write finished; re-raises the first failure."""
+    global _pending
+    pending, _pending = _pending, []
+    for future in pending:
+        future.result()
+
+
+def write_table(df, path, export_xlsx=None):
+    """
+    Write `df` under the table name `path` with the configured backend and
+    return the written path. An .xlsx copy for human review is also written
+    when `export_xlsx` (default: config EXPORT_XLSX) is set.
+    """
+    fmt = _backend()
+    if export_xlsx is None:
+        export_xlsx = EXPORT_XLSX
+    if _writer is not None:
+        # shallow copy: with copy-on-write the snapshot is unaffected by later edits of `df`
+        _pending.append(_writer.submit(_write, df.copy(deep=False), path, fmt, export_xlsx))
+        return _with_ext(path, EXTENSIONS[fmt])
+    return _write(df, path, fmt, export_xlsx)
+
+
+def _write(df, path, fmt, export_xlsx):
+    out_path = _with_ext(path, EXTENSIONS[fmt])
+    if fmt == "parquet":
+        _arrow_safe(df).to_parquet(out_path, index=False)
+    elif fmt == "feather":
+        _arrow_safe(df).reset_index(drop=True).to_feather(out_path)
+    else:
+        df.to_excel(out_path, index=False)
+
+    if export_xlsx and fmt != "xlsx":
+        df.to_excel(_with_ext(path, ".xlsx"), index=False)
+    return out_path
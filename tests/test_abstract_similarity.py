@@ -0,0 +1,55 @@
+# test_abstract_similarity.py
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from abstract_similarity import _vectorizer, near_duplicate_pairs
+
+
+def _texts(copies=4):
+    rng = np.random.default_rng(0)
+    vocab = [f"w{i}" for i in range(2000)]
+    texts = [" ".join(rng.choice(vocab, 40)) for _ in range(300)]
+    for i in range(20):
+        words = texts[i].split()
+        words[i] = "changed"
+        texts.append(" ".join(words))
+    texts += [texts[0]] * copies  # one text with many identical copies
+    return texts
+
+
+def test_pairs_match_brute_force_without_top_k():
+    texts = _texts(copies=0)
+    first, second, sim = near_duplicate_pairs(texts, threshold=0.8, top_k=len(texts), max_cells=5000)
+    matrix = _vectorizer().fit_transform(texts)
+    dense = (matrix @ matrix.T).toarray()
+    expected = {(a, b) for a, b in zip(*np.nonzero(np.triu(dense >= 0.8, k=1)))}
+    assert set(zip(first.tolist(), second.tolist())) == expected
+    assert np.allclose(sim, dense[first, second], atol=1e-5)
+
+
+def test_top_k_keeps_the_best_matches_of_either_text():
+    texts = _texts()
+    first, second, _ = near_duplicate_pairs(texts, threshold=0.8, top_k=2, max_cells=5000)
+    matrix = _vectorizer().fit_transform(texts)
+    dense = np.round((matrix @ matrix.T).toarray(), 5)
+    np.fill_diagonal(dense, 0)
+    expected = set()
+    for row in range(len(texts)):
+        best = [col for col in np.lexsort((np.arange(len(texts)), -dense[row])) if dense[row, col] >= 0.8][:2]
+        expected |= {(min(row, col), max(row, col)) for col in best}
+    assert set(zip(first.tolist(), second.tolist())) == expected
+    assert len(expected) == len(first)
+    assert (first < second).all()
+
+
+def test_more_copies_than_top_k_are_all_linked():
+    texts = _texts(copies=6)
+    copies = [0] + list(range(len(texts) - 6, len(texts)))
+    first, second, _ = near_duplicate_pairs(texts, threshold=0.8, top_k=2, max_cells=5000)
+    linked = {copies[0]}
+    for _ in copies:
+        linked |= {b for a, b in zip(first, second) if a in linked} | {a for a, b in zip(first, second) if b in linked}
+    assert set(copies) <= linked
@@ -0,0 +1,48 @@
+# test_dedup_index.py
+
+import pandas as pd
+
+from config import OUTPUT_WITH_FLAGS
+from duplicate_filter import DuplicateFilter
+from storage import read_table
+
+COLUMNS = ["Year", "Title", "Abstract", "Keywords", "Author", "Document Identifier", "Journal", "DOI", "Source"]
+
+OLD = [
+    (2020, "Social robots in elderly care: a systematic review", "care abstract", "", "Smith, J.", "Journal", "J1", "10.1/a", "Scopus"),
+    (2020, "Social robot in elderly care a systematic review", "care abstract, longer", "", "J. Smith", "Journal", "J1", "", "IEEE"),
+    (2019, "Tutoring robots for children", "tutor abstract", "", "Lee, K.", "Conf", "C1", "10.2/b", "ACM"),
+    (2018, "Speech interfaces for cars", "speech abstract", "", "Kim, H.", "Conf", "C2", "", "ACM"),
+]
+NEW = [
+    (2019, "Tutoring Robots for Children.", "tutor abstract, extended", "", "Lee, K.", "Journal", "J2", "", "IEEE"),
+    (2021, "Drone swarms for crop monitoring", "drone abstract", "", "Roe, P.", "Journal", "J3", "10.3/c", "PubMed"),
+    (2021, "Drone swarm for crop monitoring", "drone abstract", "", "P. Roe", "Journal", "J3", "https://doi.org/10.3/C", "WoS"),
+    (2018, "Speech interfaces for cars and trucks", "speech abstract", "", "Kim, H.", "Conf", "C2", "", "IEEE"),
+    (2022, "Exoskeleton gait assistance", "gait abstract", "", "Kim, H.", "Journal", "J4", "", "IEEE"),
+]
+
+
+def _flagged(tmp_path, rows, incremental):
+    dedup = DuplicateFilter(pd.DataFrame(rows, columns=COLUMNS), incremental=incremental)
+    dedup.result_folder_path = str(tmp_path)
+    dedup.filter_duplicates()
+    return dedup.unique_df, read_table(str(tmp_path / OUTPUT_WITH_FLAGS))
+
+
+def test_incremental_pass_equals_full_pass(tmp_path, capsys):
+    _flagged(tmp_path / "incremental", OLD, incremental=False)
+    unique_inc, flags_inc = _flagged(tmp_path / "incremental", OLD + NEW, incremental=True)
+    assert "Incremental dedup: 5 new record(s)" in capsys.readouterr().out
+    unique_full, flags_full = _flagged(tmp_path / "full", OLD + NEW, incremental=False)
+
+    columns = ["DuplicateFlag", "Keep", "DuplicateClusterId", "DOI_norm", "Title_fp", "FirstAuthorLast"]
+    pd.testing.assert_frame_equal(flags_inc[columns], flags_full[columns])
+    pd.testing.assert_frame_equal(unique_inc, unique_full)
+    assert flags_full["DuplicateClusterId"].notna().tolist() == [True] * 8 + [False]
+
+
+def test_changed_index_falls_back_to_a_full_pass(tmp_path, capsys):
+    _flagged(tmp_path, OLD, incremental=False)
+    _flagged(tmp_path, OLD[1:] + NEW, incremental=True)
+    assert "Incremental dedup not possible (1 indexed record(s) changed or were removed)" in capsys.readouterr().out
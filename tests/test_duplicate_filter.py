@@ -0,0 +1,149 @@
+# test_duplicate_filter.py
+
+import numpy as np
+import pytest
+import pandas as pd
+
+from dedup_keys import PREFERRED_SOURCES, source_rank, source_ranks
+from duplicate_filter import DuplicateFilter, UnionFind, _first_author_last, _first_author_lasts
+
+
+def _records(rows):
+    columns = ["Year", "Title", "Abstract", "Keywords", "Author", "Document Identifier", "Journal", "DOI", "Source"]
+    return pd.DataFrame([dict(zip(columns, row)) for row in rows], columns=columns)
+
+
+def test_first_author_surname_both_name_orders():
+    authors = ["Smith, J.; Doe, A.", "J. Smith; A. Doe", "Smith, John", "van der Berg, K."]
+    assert [_first_author_last(a) for a in authors] == ["smith", "smith", "smith", "berg"]
+    assert _first_author_lasts(pd.Series(authors)).tolist() == [_first_author_last(a) for a in authors]
+
+
+def test_surname_first_authors_are_not_blocked_by_initial():
+    # the same initial and year, different surnames: different blocks
+    authors = pd.Series(["Author1, X.", "Author2, X.", "Author3, X."])
+    assert _first_author_lasts(authors).tolist() == ["author1", "author2", "author3"]
+
+
+def test_fuzzy_match_across_author_formats():
+    df = _records([
+        (2020, "Social robots in elderly care: a systematic review", "", "", "Smith, John", "Journal", "", "", "Scopus"),
+        (2020, "Social robot in elderly care a systematic review", "", "", "J. Smith", "Journal", "", "", "IEEE"),
+        (2020, "Social robots in elderly care: a systematic review!", "", "", "Jones, A.", "Journal", "", "", "ACM"),
+    ])
+    flagged = DuplicateFilter(df)._flag_duplicates(df.copy())
+    # rows 0 and 1 only meet in the (smith, 2020) block; row 2 shares row 0's fingerprint
+    assert flagged["DuplicateClusterId"].tolist() == [1, 1, 1]
+    assert flagged["DuplicateFlag"].iloc[1].startswith("Fuzzy Title")
+    assert flagged["Keep"].tolist() == [True, False, False]
+
+
+def test_missing_authors_have_an_empty_key():
+    authors = pd.Series(["Nan, Li", np.nan, None, "", "  "], dtype=object)
+    expected = ["nan", "", "", "", ""]
+    assert [_first_author_last(a) for a in authors] == expected
+    assert _first_author_lasts(authors).tolist() == expected
+    assert _first_author_lasts(authors.astype("category")).tolist() == expected
+
+
+def test_best_match_scores_share_one_scale(monkeypatch):
+    pytest.importorskip("sklearn")
+    import duplicate_filter
+    monkeypatch.setattr(duplicate_filter, "ABSTRACT_SIMILARITY", True)
+    monkeypatch.setattr(duplicate_filter, "ABSTRACT_SIMILARITY_MIN_WORDS", 3)
+    shared = "robots assisted older adults during daily routines in nursing homes"
+    df = _records([
+        (2020, "Social robots in elderly care: a systematic review", shared, "", "Smith, J.", "Journal", "", "", "Scopus"),
+        (2020, "Social robot in elderly care a systematic review", shared, "", "Smith, J.", "Journal", "", "", "IEEE"),
+        (2019, "Grasp planning for warehouse picking", "suction grippers picking parcels from cluttered bins", "", "Lee, K.", "Conf", "", "", "ACM"),
+        (2018, "Speech interfaces for cars", "voice assistants reduce driver distraction on highways", "", "Kim, H.", "Conf", "", "", "ACM"),
+        (2017, "Drone swarms for crop monitoring", "multispectral imaging of wheat fields by cooperating drones", "", "Roe, P.", "Journal", "", "", "ACM"),
+    ])
+    dedup = DuplicateFilter(df)
+    flagged = dedup._flag_duplicates(df.copy())
+    # identical abstracts (cosine 1.0) outrank the fuzzy title score (below 100)
+    assert flagged["DuplicateFlag"].iloc[1].startswith("Near-duplicate Abstract")
+    assert all(0 <= score <= 1 for score, _ in dedup.best_match.values())
+
+
+def _partition(cluster_ids):
+    groups = {}
+    for row, cluster in enumerate(cluster_ids):
+        if not pd.isna(cluster):
+            groups.setdefault(cluster, set()).add(row)
+    return sorted(sorted(g) for g in groups.values())
+
+
+@pytest.mark.parametrize("chunk_rows", [3, 2000])
+def test_fuzzy_block_scoring_matches_pairwise_scores(monkeypatch, chunk_rows):
+    import duplicate_filter
+    from rapidfuzz import fuzz
+    monkeypatch.setattr(duplicate_filter, "FUZZY_CHUNK_ROWS", chunk_rows)
+    rng = np.random.default_rng(0)
+    words = "robot child social learning tutor speech gaze classroom peer therapy autism emotion".split()
+    titles = []
+    for _ in range(12):
+        base = list(rng.choice(words, 6, replace=False))
+        titles.append(" ".join(base))
+        titles.append(" ".join(reversed(base)).title() + "!")  # same fingerprint
+        titles.append(" ".join(base) + " pilot")  # token_set_ratio 100, another fingerprint
+        titles.append(" ".join(base[:5]) + " " + base[5] + "s")  # plural, scored by the ratio only
+    df = _records([(2020, t, "", "", "Smith, J.", "Journal", "", "", "IEEE") for t in titles])
+    flagged = DuplicateFilter(df)._flag_duplicates(df.copy())
+    assert flagged["DuplicateFlag"].str.startswith("Fuzzy Title").any()
+
+    fingerprints = flagged["Title_fp"].tolist()
+    first_of = {}
+    candidates = [row for row, fp in enumerate(fingerprints) if first_of.setdefault(fp, row) == row]
+    parent = list(range(len(titles)))
+    def find(x):
+        while parent[x] != x:
+            x = parent[x]
+        return x
+    for row, fp in enumerate(fingerprints):
+        parent[find(row)] = find(first_of[fp])
+    for i, a in enumerate(candidates):
+        for b in candidates[i + 1:]:
+            if fuzz.token_set_ratio(titles[a], titles[b]) >= duplicate_filter.FUZZY_TITLE_THRESHOLD:
+                parent[find(b)] = find(a)
+    expected = {}
+    for row in range(len(titles)):
+        expected.setdefault(find(row), []).append(row)
+    assert _partition(flagged["DuplicateClusterId"]) == sorted(g for g in expected.values() if len(g) > 1)
+
+
+def test_union_find_clusters_are_transitive():
+    clusters = UnionFind(6)
+    clusters.union_pairs(np.array([0, 3]), np.array([1, 4]))
+    clusters.union_pairs(np.array([1]), np.array([2]))
+    roots = clusters.roots()
+    assert roots[0] == roots[1] == roots[2]
+    assert roots[3] == roots[4] != roots[0]
+    assert roots[5] not in (roots[0], roots[3])
+
+
+def test_cluster_representative_is_deterministic():
+    # A~B share a DOI, B~C share a title fingerprint: one cluster of three
+    rows = [
+        (2020, "Robots for autism therapy", "short", "", "Smith, J.", "Journal", "", "10.1/a", "ACM"),
+        (2020, "A different wording entirely", "the same longer abstract", "", "Smith, J.", "Journal", "",
+         "https://doi.org/10.1/A", "IEEE"),
+        (2020, "a different wording, entirely", "the same longer abstract", "", "Smith, J.", "Journal", "", "10.2/b",
+         "Scopus"),
+        (2021, "Unrelated grasping work", "", "", "Lee, K.", "Conf", "", "", "IEEE"),
+    ]
+    kept = []
+    for order in ([0, 1, 2, 3], [3, 2, 1, 0], [1, 3, 0, 2]):
+        df = _records([rows[i] for i in order])
+        flagged = DuplicateFilter(df)._flag_duplicates(df.copy())
+        assert _partition(flagged["DuplicateClusterId"]) == [sorted(order.index(i) for i in (0, 1, 2))]
+        kept.append(sorted(flagged.loc[flagged["Keep"], "Source"].astype(str)))
+    # DOI first, then the longer abstract, then the preferred source (Scopus over IEEE)
+    assert kept == [["IEEE", "Scopus"]] * 3
+
+
+def test_source_ranks_match_the_per_record_rank():
+    sources = pd.Series(PREFERRED_SOURCES + ["Other", None], dtype="str")
+    ranks = source_ranks(sources)
+    assert ranks.tolist() == [source_rank(s) for s in PREFERRED_SOURCES] + [0, 0]
+    assert ranks.tolist()[:len(PREFERRED_SOURCES)] == sorted(ranks[:len(PREFERRED_SOURCES)], reverse=True)
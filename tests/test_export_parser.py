@@ -0,0 +1,82 @@
+# test_export_parser.py
+
+from export_parser import BIBTEX, PUBMED, RIS, iter_export_records, parse_bibtex_entry
+from paper_consolidator import PaperConsolidator
+
+
+def _records(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content, encoding="utf-8")
+    return list(iter_export_records(str(path)))
+
+
+def test_bibtex_nested_braces_and_quoted_values():
+    entry = ('@article{key1,\n'
+             '  title = {A {Nested {Brace}} Title},\n'
+             '  author = "Smith, J. and {O}\'Neil, K.",\n'
+             '  journal = "Robots, \\"Quoted\\" and {Braced}",\n'
+             '  year = 2021,\n'
+             '  abstract = {First line\n    second line}\n'
+             '}')
+    doc_type, identifier, fields = parse_bibtex_entry(entry)
+    assert (doc_type, identifier) == ("article", "key1")
+    assert fields["title"] == "A {Nested {Brace}} Title"
+    assert fields["author"] == "Smith, J. and {O}'Neil, K."
+    assert fields["journal"] == 'Robots, \\"Quoted\\" and {Braced}'
+    assert fields["year"] == "2021"
+    assert fields["abstract"] == "First line     second line"
+
+
+def test_bibtex_comment_string_and_preamble_are_skipped(tmp_path):
+    records = _records(tmp_path, "export.bib",
+                       "@comment{jabref-meta: databaseType:bibtex;}\n"
+                       "@string{hri = {Human-Robot Interaction}}\n"
+                       "@preamble{\"\\newcommand{\\noop}[1]{}\"}\n"
+                       "@inproceedings{a, title = {First}, year = {2020}}\n"
+                       "@Article{b,\n  Title = {Second},\n  DOI = {10.1/x}\n}\n")
+    assert [fmt for fmt, _ in records] == [BIBTEX, BIBTEX]
+    assert [(r[1], r[2]["title"]) for _, r in records] == [("a", "First"), ("b", "Second")]
+    assert records[1][1][2]["doi"] == "10.1/x"
+
+
+def test_ris_records_indexed_by_tag(tmp_path):
+    records = _records(tmp_path, "export.ris",
+                       "TY  - JOUR\nAU  - Smith, J.\nAU  - Doe, A.\nTI  - Robots in class\n"
+                       "KW  - robot\nKW  - education\nDO  - 10.1/abc\nER  - \n\n"
+                       "TY  - CONF\nT1  - Second record\nPY  - 2020///\nER  - \n")
+    assert [fmt for fmt, _ in records] == [RIS, RIS]
+    first, second = (index for _, index in records)
+    assert first["AU"] == ["Smith, J.", "Doe, A."]
+    assert first["KW"] == ["robot", "education"]
+    assert first["TI"] == ["Robots in class"] and first["DO"] == ["10.1/abc"]
+    assert second["T1"] == ["Second record"] and second["PY"] == ["2020///"]
+
+
+def test_ris_without_er_tags_splits_on_blank_lines(tmp_path):
+    records = _records(tmp_path, "export.ris", "TY  - JOUR\nTI  - One\n\nTY  - JOUR\nTI  - Two\n")
+    assert [index["TI"] for _, index in records] == [["One"], ["Two"]]
+
+
+def test_medline_continuation_lines_and_doi(tmp_path):
+    records = _records(tmp_path, "export.txt",
+                       "PMID- 123\n"
+                       "TI  - A long title that wraps\n"
+                       "      onto a second line.\n"
+                       "AB  - Abstract line one\n"
+                       "      line two.\n"
+                       "AID - S0001 [pii]\n"
+                       "AID - 10.1000/xyz [doi]\n"
+                       "DP  - 2019 Mar\n"
+                       "\n"
+                       "PMID- 456\n"
+                       "TI  - Second\n")
+    assert [fmt for fmt, _ in records] == [PUBMED, PUBMED]
+    index = records[0][1]
+    assert index["TI"] == ["A long title that wraps onto a second line."]
+    assert index["AB"] == ["Abstract line one line two."]
+    assert index["AID"] == ["S0001 [pii]", "10.1000/xyz [doi]"]
+    assert records[1][1]["PMID"] == ["456"]
+
+    record = PaperConsolidator("", workers=1)._pubmed_record(index, "PubMed")
+    assert record["DOI"] == "10.1000/xyz"
+    assert record["Title"] == "A long title that wraps onto a second line."
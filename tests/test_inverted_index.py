@@ -0,0 +1,93 @@
+# test_inverted_index.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import STAGE1, STAGE2, STAGE3, Sorting_Stage
+from inverted_index import InvertedIndex
+from query_compiler import compile_query, leaf_terms
+
+TEXTS = pd.Series([
+    "Human-Robot interaction", "human robot", "HUMAN--robot", "human-robotics", "a child-robot, b",
+    "Interactive microrobots", "nanorobot", "C++ and c#", "naïve childé robot", "", None, "-human-robot-",
+    "review of the state-of-the-art", "state of  the art", "social robotics; child", "x_y robot_arm",
+    "Robot’s child", "Child-Directed speech", "child-directedness", "AI in training",
+    "  leading space human robot interaction ", "CRI.", "cri2", "İstanbul robot", "straße Robot",
+    "HRI\nrobot", "human\trobot", "co-robot arm", "co robot arm", "socially assistive robots for autism",
+    "the childé robot study", "robotö and child", "éducation robot", "child robot", "Ünterricht c++ ñ",
+], dtype=object)
+
+QUERIES = [
+    ('human-robot OR "human robot" OR hri', "word"),        # hyphen, phrase, short term
+    ("*robot* AND child*", "word"),                          # infix and prefix wildcards
+    ('"state-of-the-art" OR "c++" OR x_y', "word"),          # punctuation inside terms
+    ('co-robot ANDNOT "co robot"', "word"),
+    ('"robot arm" OR robot_arm OR autis*', "substring"),
+    ("child-direct* OR socially assist*", "substring"),
+    ("child AND robot ANDNOT c++", "word"),                 # words next to non-ASCII letters
+    ('"robot study" OR ñ', "substring"),
+]
+QUERIES += [(q, "word") for q in (STAGE1, STAGE2, STAGE3)]
+QUERIES += [(list(entry.values())[0], "substring") for entry in Sorting_Stage]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return InvertedIndex(TEXTS)
+
+
+@pytest.mark.parametrize("query,style", QUERIES)
+def test_index_matches_regex_scan(index, query, style):
+    node = compile_query(query.strip(), style)
+    for term in leaf_terms(node):
+        expected = term.mask(TEXTS).to_numpy(dtype=bool)
+        assert (index.term_mask(term) == expected).all(), term.text
+    assert (node.evaluate(index) == node.mask(TEXTS).to_numpy(dtype=bool)).all()
+
+
+def test_evaluation_within_rows(index):
+    node = compile_query("robot* AND (human OR child*)")
+    rows = np.zeros(len(TEXTS), dtype=bool)
+    rows[::2] = True
+    expected = node.mask(TEXTS).to_numpy(dtype=bool) & rows
+    assert (node.evaluate(index, rows) == expected).all()
+
+
+def test_index_of_arrow_strings_matches_object_strings():
+    arrow = TEXTS.astype("str")
+    node = compile_query(STAGE1.strip())
+    assert (node.evaluate(InvertedIndex(arrow)) == node.evaluate(InvertedIndex(TEXTS))).all()
+
+
+@pytest.mark.parametrize("fallback", [False, True])
+def test_chunked_and_fallback_tokenizing(monkeypatch, fallback):
+    import inverted_index
+    monkeypatch.setattr(inverted_index, "_CHUNK_SIZE", 7)
+    if fallback:  # the re tokenizer used without pyarrow
+        monkeypatch.setattr(inverted_index, "_tokenize_arrow", inverted_index._tokenize_python)
+    index = InvertedIndex(TEXTS)
+    for query, style in QUERIES[:6]:
+        node = compile_query(query, style)
+        assert (node.evaluate(index) == node.mask(TEXTS).to_numpy(dtype=bool)).all(), query
+
+
+@pytest.mark.parametrize("query,style", QUERIES)
+def test_arrow_string_scan_matches_python_re(index, query, style):
+    # pyarrow columns are scanned by RE2, which reads \w and \b as ASCII only
+    arrow = TEXTS.astype("str")
+    node = compile_query(query.strip(), style)
+    for term in leaf_terms(node):
+        assert (term.mask(arrow).to_numpy(dtype=bool) == index.term_mask(term)).all(), term.text
+    expected = node.evaluate(index)
+    assert (node.mask(arrow).to_numpy(dtype=bool) == expected).all()
+    assert (node.evaluate(InvertedIndex(arrow)) == expected).all()
+
+
+def test_non_ascii_words_on_every_engine():
+    texts = pd.Series(["the childé robot study", "robotö and child", "child robot"], dtype="str")
+    node = compile_query("child AND robot")
+    expected = [False, False, True]
+    assert node.mask(texts).tolist() == expected
+    assert node.mask(texts.astype(object)).tolist() == expected
+    assert node.evaluate(InvertedIndex(texts)).tolist() == expected
@@ -0,0 +1,54 @@
+# test_pipeline.py
+
+import os
+import time
+
+import pandas as pd
+
+from pipeline import DagRunner, Node, _sha256_files
+
+
+def _runner(tmp_path, nodes):
+    runner = DagRunner(nodes)
+    runner.result_folder_path = str(tmp_path)
+    runner.state_path = os.path.join(str(tmp_path), "state.json")
+    return runner
+
+
+def test_xlsx_tables_are_keyed_by_content(tmp_path):
+    df = pd.DataFrame({"Title": ["a", "b"], "Year": [2020, 2021]})
+    path = str(tmp_path / "table.xlsx")
+    df.to_excel(path, index=False)
+    first = _sha256_files([path])
+    time.sleep(1.1)  # the next write gets another timestamp in the file metadata
+    df.to_excel(path, index=False)
+    assert _sha256_files([path]) == first
+    df.assign(Year=[2020, 2022]).to_excel(path, index=False)
+    assert _sha256_files([path]) != first
+
+
+def test_unchanged_output_does_not_invalidate_downstream(tmp_path):
+    runs = []
+    source, middle = str(tmp_path / "source.txt"), str(tmp_path / "middle.txt")
+    with open(source, "w") as f:
+        f.write("1\n")
+
+    def upstream(inputs):
+        runs.append("upstream")
+        with open(middle, "w") as f:
+            f.write("constant\n")
+        return [middle]
+
+    def downstream(inputs):
+        runs.append("downstream")
+        return inputs
+
+    def nodes(setting):
+        return [Node("upstream", upstream, config_values={"setting": setting}, sources=lambda: [source]),
+                Node("downstream", downstream, deps=["upstream"])]
+
+    _runner(tmp_path, nodes(1)).run()
+    _runner(tmp_path, nodes(1)).run()
+    assert runs == ["upstream", "downstream"]
+    _runner(tmp_path, nodes(2)).run()
+    assert runs == ["upstream", "downstream", "upstream"]
@@ -0,0 +1,54 @@
+# test_query_compiler.py
+
+import pandas as pd
+import pytest
+
+from query_compiler import And, Or, Term, compile_query
+
+
+def _match(query, texts, style="word"):
+    node = compile_query(query, style)
+    series = pd.Series(texts, dtype=object)
+    return node.mask(series).tolist(), [node.matches(t.lower()) for t in texts]
+
+
+def test_or_binds_tighter_than_and():
+    node = compile_query("robot OR agent AND child")
+    assert isinstance(node, And)
+    assert isinstance(node.positive[0], Or) and [c.text for c in node.positive[0].children] == ["robot", "agent"]
+    assert node.positive[1].text == "child"
+    texts = ["robot", "child", "agent child", "robot child"]
+    for mask in _match("robot OR agent AND child", texts):
+        assert mask == [False, False, True, True]
+
+
+def test_parentheses_andnot_and_flattening():
+    node = compile_query("(robot AND (child AND tutor)) ANDNOT (survey OR review)")
+    assert [c.text for c in node.positive] == ["robot", "child", "tutor"]
+    assert [c.text for c in node.negative[0].children] == ["survey", "review"]
+    assert compile_query("robot NotAND review").describe() == compile_query("robot ANDNOT review").describe()
+    texts = ["robot child tutor", "robot child tutor review", "robot child"]
+    for mask in _match("(robot AND (child AND tutor)) ANDNOT (survey OR review)", texts):
+        assert mask == [True, False, False]
+
+
+def test_terms_phrases_and_wildcards():
+    node = compile_query('"social robot" OR human robot interaction')
+    assert [c.text for c in node.children] == ['"social robot"', "human robot interaction"]
+    texts = ["a social robots study", "a social robot study", "tutoring", "robots"]
+    for mask in _match('"social robot" OR tutor*', texts):
+        assert mask == [False, True, True, False]
+    # word style matches whole words; substring style matches anywhere
+    assert _match("robot", ["robotics"])[0] == [False]
+    assert _match("robot", ["robotics"], style="substring")[0] == [True]
+    assert _match("co-robot", ["a co-robot arm", "a co robot arm"])[0] == [True, False]
+
+
+@pytest.mark.parametrize("query", ["robot AND", "(robot OR child", "robot OR child)", "AND robot", ""])
+def test_malformed_queries_raise(query):
+    with pytest.raises(ValueError):
+        compile_query(query)
+
+
+def test_single_term_is_a_term():
+    assert isinstance(compile_query("robot"), Term)
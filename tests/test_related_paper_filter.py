@@ -0,0 +1,61 @@
+# test_related_paper_filter.py
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import related_paper_filter
+from config import STAGE1
+from query_compiler import compile_query, leaf_terms
+from related_paper_filter import STAGE_TO_STATS, RelatedPaperFilter
+
+WORDS = ("robot robots child children social interaction speech tutor classroom autism therapy review "
+         "human-robot engagement learning language gaze peer education survey").split()
+
+
+def _corpus(n=400):
+    rng = np.random.default_rng(0)
+    texts = [" ".join(rng.choice(WORDS, 12)) for _ in range(n)]
+    return pd.DataFrame({"Title": texts[: n // 2] + [""] * (n - n // 2), "Abstract": [""] * (n // 2) + texts[n // 2:]})
+
+
+@pytest.mark.parametrize("use_index", [False, True])
+def test_stage_stats_follow_the_evaluation(tmp_path, monkeypatch, use_index):
+    monkeypatch.setattr(related_paper_filter, "QUERY_TERM_STATS", True)
+    rpf = RelatedPaperFilter(_corpus())
+    rpf.result_folder_path = str(tmp_path)
+    rpf._use_index = use_index
+    text = rpf._combine_cols(rpf.input_file)
+    related = rpf._stage_condition(text, 1)
+    with open(tmp_path / STAGE_TO_STATS[1], encoding="utf-8") as f:
+        stats = json.load(f)
+
+    # replay the steps in the logged order with per-text matching
+    node = compile_query(STAGE1.strip())
+    groups = {g.describe(): g for g in node.positive + node.negative}
+    texts = text.astype(object).str.lower().tolist()
+    alive = np.ones(len(texts), dtype=bool)
+    for step in stats["steps"]:
+        group = groups[step["group"]]
+        hit = np.array([group.matches(t) for t in texts]) & alive
+        assert step["rows_in"] == alive.sum() and step["hits"] == hit.sum()
+        masks = [np.array([t.matches(x) for x in texts]) & alive for t in leaf_terms(group)]
+        matched_by = np.sum(masks, axis=0)
+        for term, mask in zip(step["terms"], masks):
+            assert term["hits"] == mask.sum()
+            assert term["unique_hits"] == (mask & (matched_by == 1)).sum()
+        alive &= ~hit if step["negated"] else hit
+        assert step["rows_out"] == alive.sum()
+    assert stats["related"] == alive.sum() == related.sum()
+
+
+def test_scan_skips_keyword_stats_by_default(tmp_path):
+    rpf = RelatedPaperFilter(_corpus())
+    rpf.result_folder_path = str(tmp_path)
+    rpf._stage_condition(rpf._combine_cols(rpf.input_file), 1)
+    with open(tmp_path / STAGE_TO_STATS[1], encoding="utf-8") as f:
+        stats = json.load(f)
+    assert stats["engine"] == "regex scan"
+    assert all("terms" not in step for step in stats["steps"])